@@ -14,6 +14,8 @@ warning which allows the bot to start without the rate limiter.
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import itertools
 import json
 import logging
 import warnings
@@ -21,13 +23,21 @@ import os
 import random
 import re
 import sys
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from zipfile import ZIP_DEFLATED, ZipFile
-from collections.abc import Iterable
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Union
-from xml.sax.saxutils import escape
+from functools import lru_cache, partial
+from typing import IO, TYPE_CHECKING, Any, Dict, Optional, Sequence, Union
+
+try:  # pragma: no cover - declared dependency; the stdlib json fallback keeps old installs working
+    import orjson
+except ModuleNotFoundError:  # pragma: no cover - handled at runtime
+    orjson = None  # type: ignore[assignment]
 
 try:  # pragma: no cover - optional dependency
     from google.auth.transport.requests import Request as GoogleAuthRequest
@@ -59,20 +69,20 @@ class _MissingTelegramModule:
         raise RuntimeError(_TELEGRAM_DEPENDENCY_INSTRUCTIONS)
 
 
-@dataclass
+@dataclass(slots=True)
 class Chat:
     id: int
     type: str = "private"
     title: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     id: int
     full_name: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class Update:
     effective_chat: Optional[Chat] = None
     effective_user: Optional[User] = None
@@ -99,6 +109,7 @@ if TYPE_CHECKING:
         AIORateLimiter as _AIORateLimiter,
         Application,
         ApplicationBuilder,
+        BaseUpdateProcessor as _BaseUpdateProcessor,
         CallbackQueryHandler,
         CommandHandler,
         ContextTypes,
@@ -141,12 +152,17 @@ else:  # pragma: no cover - import depends on environment
         filters = _MissingTelegramModule()  # type: ignore[assignment]
         TelegramInvalidToken = TelegramNetworkError = TelegramTimedOut = RuntimeError  # type: ignore[assignment]
         _AIORateLimiter = None
+        _BaseUpdateProcessor = None
         PTBUserWarning = Warning  # type: ignore[assignment]
     else:
         try:
             from telegram.ext import AIORateLimiter as _AIORateLimiter
         except ImportError:  # pragma: no cover - optional dependency
             _AIORateLimiter = None
+        try:
+            from telegram.ext import BaseUpdateProcessor as _BaseUpdateProcessor
+        except ImportError:  # pragma: no cover - added in python-telegram-bot 20.4
+            _BaseUpdateProcessor = None
         try:
             from telegram.warnings import PTBUserWarning
         except ImportError:  # pragma: no cover - warning class depends on version
@@ -169,7 +185,60 @@ def _require_telegram() -> None:
         raise RuntimeError(_TELEGRAM_DEPENDENCY_INSTRUCTIONS) from TELEGRAM_IMPORT_ERROR
 
 
-@dataclass
+class _PerChatOrdering:
+    """Run updates from different chats concurrently, keeping each chat in order.
+
+    Mixed into PTB's ``BaseUpdateProcessor``, whose ``process_update`` holds one
+    of its concurrency slots while ``do_process_update`` runs. The chat's turn is
+    awaited before that slot is taken, so a backlog in one chat never occupies
+    slots the other chats need.
+    """
+
+    def __init__(self, max_concurrent_updates: int) -> None:
+        super().__init__(max_concurrent_updates)  # type: ignore[call-arg]
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._pending: dict[int, int] = {}
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat = getattr(update, "effective_chat", None)
+        if chat is None:
+            await super().process_update(update, coroutine)  # type: ignore[misc]
+            return
+
+        chat_id = chat.id
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._pending[chat_id] = self._pending.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)  # type: ignore[misc]
+        finally:
+            remaining = self._pending[chat_id] - 1
+            if remaining:
+                self._pending[chat_id] = remaining
+            else:
+                del self._pending[chat_id]
+                del self._chat_locks[chat_id]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+if _BaseUpdateProcessor is not None:  # pragma: no cover - requires python-telegram-bot
+
+    class _PerChatUpdateProcessor(_PerChatOrdering, _BaseUpdateProcessor):
+        pass
+
+else:
+    _PerChatUpdateProcessor = None
+
+
+@dataclass(slots=True)
 class MediaAttachment:
     """Representation of a media payload that can be resent later."""
 
@@ -180,7 +249,7 @@ class MediaAttachment:
     preview_mime: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ContentBlock:
     """Rich content containing text and optional media attachments."""
 
@@ -188,22 +257,12 @@ class ContentBlock:
     media: list[MediaAttachment] = field(default_factory=list)
 
     def copy(self) -> "ContentBlock":
-        return ContentBlock(
-            text=self.text,
-            media=[
-                MediaAttachment(
-                    kind=item.kind,
-                    file_id=item.file_id,
-                    caption=item.caption,
-                    preview_base64=item.preview_base64,
-                    preview_mime=item.preview_mime,
-                )
-                for item in self.media
-            ],
-        )
+        # Stored attachments are never mutated in place (edits replace the list and
+        # outgoing captions are trimmed on clones), so copies can share them.
+        return ContentBlock(text=self.text, media=[*self.media])
 
 
-@dataclass
+@dataclass(slots=True)
 class BotContent:
     """Mutable content blocks that administrators can edit at runtime."""
 
@@ -217,6 +276,10 @@ class BotContent:
 
     @classmethod
     def default(cls) -> "BotContent":
+        return _default_bot_content().copy()
+
+    @classmethod
+    def _build_default(cls) -> "BotContent":
         return cls(
             schedule=ContentBlock(
                 text=(
@@ -302,6 +365,14 @@ class BotContent:
             vocabulary=[entry.copy() for entry in self.vocabulary],
         )
 
+
+@lru_cache(maxsize=None)
+def _default_bot_content() -> BotContent:
+    """Build the built-in content once; callers receive copies via ``BotContent.default``."""
+
+    return BotContent._build_default()
+
+
 @dataclass
 class ConfettiTelegramBot:
     """Light-weight wrapper around the PTB application builder."""
@@ -313,6 +384,18 @@ class ConfettiTelegramBot:
 
     CAPTION_LIMIT = 1024
     MESSAGE_LIMIT = 4096
+    # Parallel sends during a broadcast; stays below Telegram's ~30 msg/s limit.
+    BROADCAST_CONCURRENCY = 25
+    # Upper bound on Telegram requests in flight across all handlers.
+    SEND_CONCURRENCY = 30
+    # Updates handled at once; a slow handler only delays its own chat.
+    UPDATE_CONCURRENCY = 64
+    # Admin edits arriving within this window are written to disk together.
+    SAVE_DEBOUNCE_SECONDS = 0.5
+    # While the application runs, dirty state is flushed on this period instead.
+    STATE_FLUSH_INTERVAL = 2.0
+    # Requests rejected with RetryAfter (HTTP 429) are re-sent after the advised delay.
+    RATE_LIMIT_MAX_RETRIES = 3
 
     REGISTRATION_PROGRAM = 1
     REGISTRATION_CHILD_NAME = 2
@@ -326,29 +409,71 @@ class ConfettiTelegramBot:
     CANCELLATION_PROGRAM = 21
     CANCELLATION_REASON = 22
 
-    MAIN_MENU_BUTTON = "⬅️ Главное меню"
-    REGISTRATION_BUTTON = "📝 Запись"
-    CANCELLATION_BUTTON = "❗️ Отменить занятие"
-    REGISTRATION_CONFIRM_SAVED_BUTTON = "✅ Продолжить"
-    REGISTRATION_EDIT_DETAILS_BUTTON = "✏️ Изменить данные"
-    REGISTRATION_KEEP_TIME_BUTTON = "🔁 То же время"
-    REGISTRATION_NEW_TIME_BUTTON = "⏰ Другое время"
-    BACK_BUTTON = "◀️ Назад"
-    REGISTRATION_LIST_BUTTON = "📋 Список записей"
-    ADMIN_MENU_BUTTON = "🛠 Админ-панель"
-    ADMIN_BACK_TO_USER_BUTTON = "⬅️ Пользовательское меню"
-    ADMIN_BROADCAST_BUTTON = "📣 Рассылка"
-    ADMIN_EXPORT_TABLE_BUTTON = "📊 Таблица заявок"
-    ADMIN_MANAGE_ADMINS_BUTTON = "👤 Редактировать администраторов"
-    ADMIN_EDIT_SCHEDULE_BUTTON = "🗓 Редактировать расписание"
-    ADMIN_EDIT_ABOUT_BUTTON = "ℹ️ Редактировать информацию"
-    ADMIN_EDIT_TEACHERS_BUTTON = "👩‍🏫 Редактировать преподавателей"
-    ADMIN_EDIT_ALBUM_BUTTON = "📸 Редактировать фотоальбом"
-    ADMIN_EDIT_CONTACTS_BUTTON = "📞 Редактировать контакты"
-    ADMIN_EDIT_VOCABULARY_BUTTON = "📚 Редактировать словарь"
+    MAIN_MENU_BUTTON = sys.intern("⬅️ Главное меню")
+    REGISTRATION_BUTTON = sys.intern("📝 Запись")
+    CANCELLATION_BUTTON = sys.intern("❗️ Отменить занятие")
+    REGISTRATION_CONFIRM_SAVED_BUTTON = sys.intern("✅ Продолжить")
+    REGISTRATION_EDIT_DETAILS_BUTTON = sys.intern("✏️ Изменить данные")
+    REGISTRATION_KEEP_TIME_BUTTON = sys.intern("🔁 То же время")
+    REGISTRATION_NEW_TIME_BUTTON = sys.intern("⏰ Другое время")
+    BACK_BUTTON = sys.intern("◀️ Назад")
+    REGISTRATION_LIST_BUTTON = sys.intern("📋 Список записей")
+    ADMIN_MENU_BUTTON = sys.intern("🛠 Админ-панель")
+    ADMIN_BACK_TO_USER_BUTTON = sys.intern("⬅️ Пользовательское меню")
+    ADMIN_BROADCAST_BUTTON = sys.intern("📣 Рассылка")
+    ADMIN_EXPORT_TABLE_BUTTON = sys.intern("📊 Таблица заявок")
+    ADMIN_MANAGE_ADMINS_BUTTON = sys.intern("👤 Редактировать администраторов")
+    ADMIN_EDIT_SCHEDULE_BUTTON = sys.intern("🗓 Редактировать расписание")
+    ADMIN_EDIT_ABOUT_BUTTON = sys.intern("ℹ️ Редактировать информацию")
+    ADMIN_EDIT_TEACHERS_BUTTON = sys.intern("👩‍🏫 Редактировать преподавателей")
+    ADMIN_EDIT_ALBUM_BUTTON = sys.intern("📸 Редактировать фотоальбом")
+    ADMIN_EDIT_CONTACTS_BUTTON = sys.intern("📞 Редактировать контакты")
+    ADMIN_EDIT_VOCABULARY_BUTTON = sys.intern("📚 Редактировать словарь")
     ADMIN_CANCEL_KEYWORDS = ("отмена", "annuler", "cancel")
+    ADMIN_CANCEL_TOKENS = frozenset(keyword.casefold() for keyword in ADMIN_CANCEL_KEYWORDS)
+    # Longer messages are real admin input and skip the casefold() entirely.
+    ADMIN_CANCEL_MAX_LENGTH = max(len(keyword) for keyword in ADMIN_CANCEL_KEYWORDS)
     ADMIN_CANCEL_PROMPT = f"\n\nЧтобы отменить, нажмите «{BACK_BUTTON}» или напишите «Отмена»."
 
+    # Admin menu button -> (action kind, handler name or content field, prompt).
+    ADMIN_BUTTON_ACTIONS = {
+        ADMIN_MENU_BUTTON: ("call", "_show_admin_menu", ""),
+        ADMIN_BACK_TO_USER_BUTTON: ("call", "_show_main_menu", ""),
+        ADMIN_BROADCAST_BUTTON: (
+            "broadcast",
+            "",
+            "Отправьте сообщение или медиа для рассылки." + ADMIN_CANCEL_PROMPT,
+        ),
+        ADMIN_EXPORT_TABLE_BUTTON: ("call", "_admin_share_registrations_table", ""),
+        ADMIN_MANAGE_ADMINS_BUTTON: ("manage_admins", "", ADMIN_CANCEL_PROMPT),
+        ADMIN_EDIT_SCHEDULE_BUTTON: (
+            "edit",
+            "schedule",
+            "Отправьте текст и вложения нового расписания." + ADMIN_CANCEL_PROMPT,
+        ),
+        ADMIN_EDIT_ABOUT_BUTTON: (
+            "edit",
+            "about",
+            "Отправьте обновлённый блок «О студии» (текст, фото, видео)." + ADMIN_CANCEL_PROMPT,
+        ),
+        ADMIN_EDIT_TEACHERS_BUTTON: (
+            "edit",
+            "teachers",
+            "Поделитесь новым описанием преподавателей и медиа." + ADMIN_CANCEL_PROMPT,
+        ),
+        ADMIN_EDIT_ALBUM_BUTTON: (
+            "edit",
+            "album",
+            "Отправьте ссылку или материалы для фотоальбома." + ADMIN_CANCEL_PROMPT,
+        ),
+        ADMIN_EDIT_CONTACTS_BUTTON: (
+            "edit",
+            "contacts",
+            "Введите обновлённые контакты (при необходимости с медиа)." + ADMIN_CANCEL_PROMPT,
+        ),
+        ADMIN_EDIT_VOCABULARY_BUTTON: ("call", "_prompt_admin_vocabulary_edit", ""),
+    }
+
     EXPORT_COLUMN_WIDTHS = (
         20,
         36,
@@ -367,6 +492,25 @@ class ConfettiTelegramBot:
         ("📚 Полезные слова", CANCELLATION_BUTTON),
     )
 
+    # Fields kept per user profile and per registration snapshot in ``user_profiles``.
+    PROFILE_FIELDS = ("child_name", "class", "phone", "last_program", "last_time")
+    SNAPSHOT_FIELDS = ("program", "time", "child_name", "class", "created_at")
+    # Distinct user/chat pairs whose merged snapshots are kept in ``_collect_cache``.
+    COLLECT_CACHE_SIZE = 1024
+
+    # Record fields shown for each entry of «Список записей».
+    REGISTRATION_LIST_FIELDS = ("program", "child_name", "class", "time", "created_at", "payment_note")
+
+    # Main menu button -> name of the handler that answers it.
+    MENU_HANDLERS = {
+        sys.intern("📅 Расписание"): "_send_schedule",
+        sys.intern("ℹ️ О студии"): "_send_about",
+        sys.intern("👩‍🏫 Преподаватели"): "_send_teachers",
+        REGISTRATION_LIST_BUTTON: "_send_registration_list",
+        sys.intern("📞 Контакты"): "_send_contacts",
+        sys.intern("📚 Полезные слова"): "_send_vocabulary",
+    }
+
     TIME_OF_DAY_OPTIONS = (
         "☀️ Утро (10:00 - 12:00)",
         "🌤 День (14:00 – 16:00)",
@@ -452,6 +596,7 @@ class ConfettiTelegramBot:
             "photo_url": "https://storage.yandexcloud.net/bigbob/osen.png",
         },
     )
+    PROGRAMS_BY_LABEL = {program["label"]: program for program in PROGRAMS}
 
     TEACHERS = (
         {
@@ -504,6 +649,11 @@ class ConfettiTelegramBot:
             "photo_url": "https://storage.yandexcloud.net/bigbob/vshyk.jpg",
         },
     )
+    TEACHERS_BY_KEY = {teacher["key"]: teacher for teacher in TEACHERS}
+
+    # Order of the "|"-separated parts used when admins edit the vocabulary.
+    VOCABULARY_FIELDS = ("word", "emoji", "translation", "example_fr", "example_ru")
+    VOCABULARY_SEPARATOR_PATTERN = re.compile(r"\s*\|\s*")
 
     VOCABULARY = (
         {
@@ -536,6 +686,12 @@ class ConfettiTelegramBot:
         },
     )
 
+    # Callback data routed to the inline keyboard handlers.
+    REG_PROGRAM_CALLBACK_PATTERN = re.compile(r"^reg_program:\d+$")
+    REG_BACK_CALLBACK_PATTERN = re.compile(r"^reg_back:menu$")
+    ABOUT_CALLBACK_PATTERN = re.compile(r"^about:")
+    TEACHER_CALLBACK_PATTERN = re.compile(r"^teacher:")
+
     MEDIA_DIRECTIVE_PATTERN = re.compile(
         r"^(?P<kind>photo|video|animation|document)\s*:\s*(?P<url>https?://\S+)(?:\s*\|\s*(?P<caption>.+))?$",
         re.IGNORECASE,
@@ -549,18 +705,28 @@ class ConfettiTelegramBot:
         "album": "Фотоальбом",
         "contacts": "Контакты",
     }
+    # ``vocabulary`` is edited through its own flow, not as a content block.
+    EDITABLE_CONTENT_FIELDS = frozenset(CONTENT_LABELS)
 
     def build_application(self) -> Application:
         """Construct the PTB application."""
 
         _require_telegram()
 
-        builder = ApplicationBuilder().token(self.token)
+        builder = (
+            ApplicationBuilder()
+            .token(self.token)
+            .post_init(self._start_state_flusher)
+            .post_shutdown(self._stop_state_flusher)
+        )
 
         limiter = self._build_rate_limiter()
         if limiter is not None:
             builder = builder.rate_limiter(limiter)
 
+        if _PerChatUpdateProcessor is not None:
+            builder = builder.concurrent_updates(_PerChatUpdateProcessor(self.UPDATE_CONCURRENCY))
+
         application = builder.build()
         self._register_handlers(application)
         return application
@@ -569,13 +735,35 @@ class ConfettiTelegramBot:
         normalised = _normalise_admin_chat_ids(self.admin_chat_ids)
         self.admin_chat_ids = normalised
         self._runtime_admin_ids: set[int] = set(normalised)
-        self._admin_cancel_tokens: set[str] = {token.lower() for token in self.ADMIN_CANCEL_KEYWORDS}
         storage_path = self.storage_path or Path(os.environ.get("CONFETTI_STORAGE_PATH", "data/confetti_state.json"))
         self.storage_path = storage_path.expanduser()
-        self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+        _ensure_directory(self.storage_path.parent)
         self._known_registration_ids: set[str] = set()
+        # Sequential suffixes cannot repeat within a second, unlike random draws.
+        self._registration_id_sequence = itertools.count(random.randrange(10000))
+        self._registration_id_prefix: tuple[int, str] = (-1, "")
+        self._registration_timestamps: dict[str, datetime] = {}
+        # Per profile: (snapshot list, its length and profile version when indexed,
+        # snapshot id -> position).
+        self._snapshot_positions: dict[int, tuple[list[Any], int, int, dict[str, int]]] = {}
+        # Bumped whenever a profile's snapshot list changes; guards ``_collect_cache`` and
+        # ``_snapshot_positions``.
+        self._profile_versions: dict[int, int] = {}
+        self._collect_cache: dict[tuple[int, ...], tuple[tuple[int, ...], list[dict[str, Any]]]] = {}
+        self._storage_lock = threading.Lock()
+        # Every encoded payload gets a generation; an older one never replaces a newer file.
+        self._encoded_generation = 0
+        self._written_generation = 0
+        self._save_task: Optional[asyncio.Task[None]] = None
+        self._flush_task: Optional[asyncio.Task[None]] = None
+        self._pending_write: Optional[asyncio.Future[bool]] = None
+        # Exports share one file on disk; chats generating it concurrently take turns.
+        self._export_lock = asyncio.Lock()
         self._persistent_store: dict[str, Any] = self._load_persistent_state()
+        # The loader guarantees a dict here; handlers use this same object directly.
+        self._user_profiles: dict[int, dict[str, Any]] = self._persistent_store["user_profiles"]
         self._ensure_registration_ids()
+        self._index_registration_timestamps()
         dynamic_admins = self._persistent_store.get("dynamic_admins")
         if isinstance(dynamic_admins, set):
             self._runtime_admin_ids.update(dynamic_admins)
@@ -583,6 +771,24 @@ class ConfettiTelegramBot:
         self._bot_username: Optional[str] = None
         self._google_sheets_exporter = _GoogleSheetsExporter.from_env()
         self._last_google_sheet_url: Optional[str] = None
+        # Reply/inline keyboards are immutable once built, so static ones are shared.
+        self._markup_cache: dict[str, Any] = {}
+        self._checked_content: Optional[BotContent] = None
+        self._send_semaphore = asyncio.Semaphore(self.SEND_CONCURRENCY)
+        self._vocabulary_cache: tuple[Optional[list[dict[str, str]]], list[str]] = (None, [])
+        self._program_details: list[str] = [
+            self._format_program_details(program) for program in self.PROGRAMS
+        ]
+        self._program_selected_messages: list[str] = [
+            f"Вы выбрали программу:\n{details}" for details in self._program_details
+        ]
+        # Interned button labels by text; incoming presses are swapped for these
+        # objects so that only the fixed labels are interned, never user text.
+        button_labels = [label for row in self.MAIN_MENU_LAYOUT for label in row]
+        button_labels.extend(
+            value for name, value in vars(type(self)).items() if name.endswith("_BUTTON") and isinstance(value, str)
+        )
+        self._button_labels: dict[str, str] = {label: sys.intern(label) for label in button_labels}
 
     # ------------------------------------------------------------------
     # Persistence helpers
@@ -593,24 +799,58 @@ class ConfettiTelegramBot:
             self._persistent_store["registrations"] = []
             return
 
-        dirty = False
+        stored_ids: list[str] = []
+        missing: list[dict[str, Any]] = []
         for entry in registrations:
             if not isinstance(entry, dict):
                 continue
             record_id = entry.get("id")
-            if record_id:
-                record_id_str = str(record_id)
-                entry["id"] = record_id_str
-                self._known_registration_ids.add(record_id_str)
-            else:
-                entry["id"] = self._generate_registration_id()
-                dirty = True
-        if dirty:
+            if not record_id:
+                missing.append(entry)
+                continue
+            if type(record_id) is not str:
+                record_id = entry["id"] = str(record_id)
+            stored_ids.append(record_id)
+        self._known_registration_ids.update(stored_ids)
+        # New ids are generated only after every stored id is known, so they cannot clash.
+        for entry in missing:
+            entry["id"] = self._generate_registration_id()
+        if missing:
             self._save_persistent_state()
 
+    def _index_registration_timestamps(self) -> None:
+        """Parse ``created_at`` of every stored profile snapshot once."""
+
+        for entry in self._user_profiles.values():
+            registrations = entry.get("registrations") if isinstance(entry, dict) else None
+            if not isinstance(registrations, list):
+                continue
+            for item in registrations:
+                if isinstance(item, dict):
+                    self._remember_registration_timestamp(item)
+
+    def _remember_registration_timestamp(self, record: dict[str, Any]) -> datetime:
+        timestamp = self._parse_record_timestamp(record.get("created_at")) or datetime.min
+        record_id = record.get("id")
+        if record_id:
+            self._registration_timestamps[str(record_id)] = timestamp
+        return timestamp
+
+    def _registration_sort_key(self, record: dict[str, Any]) -> datetime:
+        timestamp = self._registration_timestamps.get(str(record.get("id")))
+        if timestamp is None:
+            timestamp = self._remember_registration_timestamp(record)
+        return timestamp
+
     def _generate_registration_id(self) -> str:
         while True:
-            candidate = datetime.utcnow().strftime("%Y%m%d%H%M%S") + f"-{random.randint(1000, 9999)}"
+            # The UTC timestamp prefix is formatted at most once per second.
+            second = time.time_ns() // 1_000_000_000
+            cached_second, prefix = self._registration_id_prefix
+            if second != cached_second:
+                prefix = time.strftime("%Y%m%d%H%M%S-", time.gmtime(second))
+                self._registration_id_prefix = (second, prefix)
+            candidate = f"{prefix}{next(self._registration_id_sequence) % 10000:04d}"
             if candidate not in self._known_registration_ids:
                 self._known_registration_ids.add(candidate)
                 return candidate
@@ -620,13 +860,16 @@ class ConfettiTelegramBot:
 
         data: dict[str, Any] = {}
 
-        if self.storage_path.exists():
-            try:
-                raw = json.loads(self.storage_path.read_text(encoding="utf-8"))
-                if isinstance(raw, dict):
-                    data.update(raw)
-            except Exception as exc:  # pragma: no cover - filesystem dependant
-                LOGGER.warning("Не удалось загрузить сохранённое состояние: %s", exc)
+        try:
+            payload = self.storage_path.read_bytes()
+            raw = orjson.loads(payload) if orjson is not None else json.loads(payload)
+        except FileNotFoundError:
+            raw = None
+        except Exception as exc:  # pragma: no cover - filesystem dependant
+            LOGGER.warning("Не удалось загрузить сохранённое состояние: %s", exc)
+            raw = None
+        if isinstance(raw, dict):
+            data.update(raw)
 
         content_payload = data.get("content")
         if isinstance(content_payload, dict):
@@ -637,11 +880,7 @@ class ConfettiTelegramBot:
 
         registrations = data.get("registrations")
         if isinstance(registrations, list):
-            filtered: list[dict[str, Any]] = []
-            for item in registrations:
-                if isinstance(item, dict):
-                    filtered.append(item)
-            data["registrations"] = filtered
+            data["registrations"] = [item for item in registrations if isinstance(item, dict)]
         else:
             data["registrations"] = []
 
@@ -673,26 +912,24 @@ class ConfettiTelegramBot:
         if not isinstance(profiles, dict):
             profiles = {}
         else:
-            normalised_profiles: dict[str, dict[str, Any]] = {}
-            for key, value in profiles.items():
-                if not isinstance(key, str) or not isinstance(value, dict):
-                    continue
 
-                def _text(field: str) -> str:
-                    payload = value.get(field)
-                    return str(payload) if payload is not None else ""
+            def _text(source: dict[str, Any], field: str) -> str:
+                payload = source.get(field)
+                if payload is None:
+                    return ""
+                return payload if type(payload) is str else str(payload)
 
-                def _item_text(source: dict[str, Any], field: str) -> str:
-                    payload = source.get(field)
-                    return str(payload) if payload is not None else ""
+            # JSON object keys are strings; profiles are indexed by the integer id in memory.
+            normalised_profiles: dict[int, dict[str, Any]] = {}
+            for raw_key, value in profiles.items():
+                if not isinstance(value, dict):
+                    continue
+                try:
+                    key = _coerce_chat_id(raw_key)
+                except ValueError:
+                    continue
 
-                entry: dict[str, Any] = {
-                    "child_name": _text("child_name"),
-                    "class": _text("class"),
-                    "phone": _text("phone"),
-                    "last_program": _text("last_program"),
-                    "last_time": _text("last_time"),
-                }
+                entry: dict[str, Any] = {field: _text(value, field) for field in self.PROFILE_FIELDS}
 
                 registrations_payload = value.get("registrations")
                 registrations: list[dict[str, str]] = []
@@ -706,16 +943,10 @@ class ConfettiTelegramBot:
                         if not reg_id or reg_id in seen_ids:
                             continue
                         seen_ids.add(reg_id)
-                        registrations.append(
-                            {
-                                "id": reg_id,
-                                "program": _item_text(item, "program"),
-                                "time": _item_text(item, "time"),
-                                "child_name": _item_text(item, "child_name"),
-                                "class": _item_text(item, "class"),
-                                "created_at": _item_text(item, "created_at"),
-                            }
-                        )
+                        snapshot = {"id": reg_id}
+                        for field in self.SNAPSHOT_FIELDS:
+                            snapshot[field] = _text(item, field)
+                        registrations.append(snapshot)
                 entry["registrations"] = registrations
                 normalised_profiles[key] = entry
             profiles = normalised_profiles
@@ -733,30 +964,126 @@ class ConfettiTelegramBot:
         payload: dict[str, Any] = {}
 
         for key, value in self._persistent_store.items():
-            if key == "content" and isinstance(value, BotContent):
+            if isinstance(value, BotContent):
                 payload[key] = self._serialize_content(value)
-            elif key in {"known_chats", "dynamic_admins"} and isinstance(value, set):
+            elif isinstance(value, set):
                 payload[key] = sorted(value)
-            elif key == "user_profiles" and isinstance(value, dict):
-                payload[key] = value
             else:
                 payload[key] = value
 
         return payload
 
+    def _encode_persistent_state(self) -> tuple[int, bytes]:
+        """Snapshot the store as JSON bytes tagged with a new generation number."""
+
+        serializable = self._serialize_persistent_store()
+        if orjson is not None:
+            payload = orjson.dumps(serializable, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            payload = json.dumps(serializable, ensure_ascii=False, indent=2).encode("utf-8")
+        self._encoded_generation += 1
+        return self._encoded_generation, payload
+
+    def _write_persistent_payload(self, generation: int, payload: bytes) -> bool:
+        """Write ``payload`` unless a newer generation already reached the disk."""
+
+        with self._storage_lock:
+            if generation <= self._written_generation:
+                return False
+            tmp_path = self.storage_path.with_suffix(self.storage_path.suffix + ".tmp")
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+            fd = os.open(tmp_path, flags, 0o644)
+            try:
+                view = memoryview(payload)
+                while view:
+                    view = view[os.write(fd, view):]
+                # The rename below must never expose a file whose data is not on disk yet.
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            tmp_path.replace(self.storage_path)
+            self._written_generation = generation
+            return True
+
     def _save_persistent_state(self) -> None:
         """Persist the current state to disk."""
 
         try:
-            serializable = self._serialize_persistent_store()
-            tmp_path = self.storage_path.with_suffix(self.storage_path.suffix + ".tmp")
-            with tmp_path.open("w", encoding="utf-8") as handle:
-                json.dump(serializable, handle, ensure_ascii=False, indent=2)
-            tmp_path.replace(self.storage_path)
+            self._write_persistent_payload(*self._encode_persistent_state())
             self._storage_dirty = False
         except Exception as exc:  # pragma: no cover - filesystem dependant
             LOGGER.warning("Не удалось сохранить состояние бота: %s", exc)
 
+    def _request_save(self) -> None:
+        """Mark the state dirty and coalesce bursts of edits into one delayed write."""
+
+        self._storage_dirty = True
+        if self._save_task is not None or self._flush_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._save_persistent_state()
+            return
+        self._save_task = loop.create_task(self._flush_after(self.SAVE_DEBOUNCE_SECONDS))
+
+    async def _flush_after(self, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+            await self._write_dirty_state()
+        finally:
+            self._save_task = None
+
+    async def _write_dirty_state(self) -> None:
+        # Edits made while the file is being written trigger another pass.
+        while self._storage_dirty:
+            try:
+                # Encode on the event loop so handlers cannot mutate the state mid-dump.
+                generation, payload = self._encode_persistent_state()
+                self._storage_dirty = False
+                # Cancelling the caller does not stop the thread, so keep a handle to it.
+                write = asyncio.ensure_future(
+                    asyncio.to_thread(self._write_persistent_payload, generation, payload)
+                )
+                self._pending_write = write
+                await asyncio.shield(write)
+            except Exception as exc:  # pragma: no cover - filesystem dependant
+                self._storage_dirty = True
+                LOGGER.warning("Не удалось сохранить состояние бота: %s", exc)
+                return
+
+    async def _periodic_flush(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self._write_dirty_state()
+
+    async def _start_state_flusher(self, application: Application) -> None:
+        """``post_init`` hook: flush pending state every few seconds while polling."""
+
+        self._flush_task = asyncio.create_task(self._periodic_flush(self.STATE_FLUSH_INTERVAL))
+
+    async def _stop_state_flusher(self, application: Application) -> None:
+        """``post_shutdown`` hook: stop the flusher and write whatever is still pending."""
+
+        task, self._flush_task = self._flush_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        write, self._pending_write = self._pending_write, None
+        if write is not None:
+            # Let a write already running in its thread finish before the final one.
+            await asyncio.gather(write, return_exceptions=True)
+        await self._write_dirty_state()
+
+    def flush_persistent_state(self) -> None:
+        """Write any pending state synchronously, e.g. on shutdown."""
+
+        if self._storage_dirty:
+            self._save_persistent_state()
+
     def _serialize_content(self, content: BotContent) -> dict[str, Any]:
         return {
             "schedule": self._serialize_content_block(content.schedule),
@@ -782,15 +1109,21 @@ class ConfettiTelegramBot:
         }
 
     def _deserialize_content(self, payload: dict[str, Any]) -> BotContent:
-        content = self.content_template.copy()
+        # Only blocks missing from the payload fall back to (copies of) the template.
+        template = self.content_template
+        blocks: dict[str, Any] = {}
         for field_name in self.CONTENT_LABELS:
             block_payload = payload.get(field_name)
             if isinstance(block_payload, dict):
-                setattr(content, field_name, self._deserialize_content_block(block_payload))
+                blocks[field_name] = self._deserialize_content_block(block_payload)
+            else:
+                blocks[field_name] = getattr(template, field_name).copy()
         vocabulary = payload.get("vocabulary")
         if isinstance(vocabulary, list):
-            content.vocabulary = [entry for entry in vocabulary if isinstance(entry, dict)]
-        return content
+            blocks["vocabulary"] = [entry for entry in vocabulary if isinstance(entry, dict)]
+        else:
+            blocks["vocabulary"] = [entry.copy() for entry in template.vocabulary]
+        return BotContent(**blocks)
 
     def _deserialize_content_block(self, payload: dict[str, Any]) -> ContentBlock:
         text = str(payload.get("text", ""))
@@ -813,15 +1146,14 @@ class ConfettiTelegramBot:
                 )
         return ContentBlock(text=text, media=media)
 
-    def _user_key(self, identity: Any | None) -> Optional[str]:
+    def _user_key(self, identity: Any | None) -> Optional[int]:
         if identity is None:
             return None
         candidate = getattr(identity, "id", identity)
         try:
-            coerced = _coerce_chat_id(candidate)  # type: ignore[arg-type]
+            return _coerce_chat_id(candidate)  # type: ignore[arg-type]
         except ValueError:
             return None
-        return str(coerced)
 
     def _get_user_defaults(self, user: Any | None) -> dict[str, str]:
         if user is None:
@@ -829,10 +1161,7 @@ class ConfettiTelegramBot:
         user_key = self._user_key(user)
         if user_key is None:
             return {}
-        profiles = self._persistent_store.setdefault("user_profiles", {})
-        if not isinstance(profiles, dict):
-            profiles = {}
-            self._persistent_store["user_profiles"] = profiles
+        profiles = self._user_profiles
         entry = profiles.get(user_key)
         if isinstance(entry, dict):
             return {
@@ -850,34 +1179,25 @@ class ConfettiTelegramBot:
         user_key = self._user_key(user)
         if user_key is None:
             return False
-        profiles = self._persistent_store.setdefault("user_profiles", {})
-        if not isinstance(profiles, dict):
-            profiles = {}
-            self._persistent_store["user_profiles"] = profiles
+        profiles = self._user_profiles
         entry = profiles.get(user_key)
         if not isinstance(entry, dict):
             entry = {}
             profiles[user_key] = entry
 
-        changed = False
-        for source_key, target_key in (
-            ("child_name", "child_name"),
-            ("class", "class"),
-            ("phone", "phone"),
-        ):
-            value = str(data.get(source_key, ""))
-            if entry.get(target_key) != value:
-                entry[target_key] = value
-                changed = True
-
+        updates = {
+            "child_name": str(data.get("child_name", "")),
+            "class": str(data.get("class", "")),
+            "phone": str(data.get("phone", "")),
+        }
         for source_key, target_key in (("program", "last_program"), ("time", "last_time")):
             value = data.get(source_key)
-            if value is None:
-                continue
-            value_str = str(value)
-            if entry.get(target_key) != value_str:
-                entry[target_key] = value_str
-                changed = True
+            if value is not None:
+                updates[target_key] = str(value)
+        # A resubmitted form with the same details leaves the profile untouched.
+        changed = any(entry.get(key) != value for key, value in updates.items())
+        if changed:
+            entry.update(updates)
 
         registrations = entry.get("registrations")
         if not isinstance(registrations, list):
@@ -886,19 +1206,14 @@ class ConfettiTelegramBot:
 
         return changed
 
-    def _identity_keys(self, *identities: Any | None) -> list[str]:
-        keys: list[str] = []
-        for identity in identities:
-            key = self._user_key(identity)
-            if key is not None and key not in keys:
-                keys.append(key)
-        return keys
+    def _identity_keys(self, *identities: Any | None) -> list[int]:
+        user_key = self._user_key
+        keys = dict.fromkeys(user_key(identity) for identity in identities)
+        keys.pop(None, None)
+        return list(keys)
 
-    def _user_profile_entry_by_key(self, user_key: str) -> dict[str, Any]:
-        profiles = self._persistent_store.setdefault("user_profiles", {})
-        if not isinstance(profiles, dict):
-            profiles = {}
-            self._persistent_store["user_profiles"] = profiles
+    def _user_profile_entry_by_key(self, user_key: int) -> dict[str, Any]:
+        profiles = self._user_profiles
         entry = profiles.get(user_key)
         if not isinstance(entry, dict):
             entry = {}
@@ -917,14 +1232,16 @@ class ConfettiTelegramBot:
         if record_id is None:
             return False
         record_id_str = str(record_id)
-        snapshot = {
-            "id": record_id_str,
-            "program": str(record.get("program", "")),
-            "time": str(record.get("time", "")),
-            "child_name": str(record.get("child_name", "")),
-            "class": str(record.get("class", "")),
-            "created_at": str(record.get("created_at", "")),
-        }
+        snapshot = {"id": record_id_str}
+        for field in self.SNAPSHOT_FIELDS:
+            snapshot[field] = str(record.get(field, ""))
+        self._remember_registration_timestamp(snapshot)
+        # Profile fields to sync are the same for every identity; resolve them once.
+        latest_fields = tuple(
+            (target_key, value)
+            for target_key, value in (("last_program", snapshot["program"]), ("last_time", snapshot["time"]))
+            if value
+        )
         changed = False
         for key in self._identity_keys(*identities):
             entry = self._user_profile_entry_by_key(key)
@@ -932,30 +1249,58 @@ class ConfettiTelegramBot:
             if not isinstance(registrations, list):
                 registrations = []
                 entry["registrations"] = registrations
-            replaced = False
-            for index, existing in enumerate(registrations):
-                if isinstance(existing, dict) and existing.get("id") == record_id_str:
-                    if existing != snapshot:
-                        registrations[index] = snapshot
-                        changed = True
-                    replaced = True
-                    break
-            if not replaced:
+            positions = self._snapshot_index(key, registrations)
+            index = positions.get(record_id_str)
+            if index is not None:
+                if registrations[index] != snapshot:
+                    registrations[index] = snapshot
+                    self._touch_profile(key)
+                    # Same id at the same position: the index stays valid for this version.
+                    self._store_snapshot_index(key, registrations, positions)
+                    changed = True
+            else:
+                positions[record_id_str] = len(registrations)
                 registrations.append(snapshot)
+                self._touch_profile(key)
+                self._store_snapshot_index(key, registrations, positions)
                 changed = True
-            if snapshot["program"] and entry.get("last_program") != snapshot["program"]:
-                entry["last_program"] = snapshot["program"]
-                changed = True
-            if snapshot["time"] and entry.get("last_time") != snapshot["time"]:
-                entry["last_time"] = snapshot["time"]
-                changed = True
+            for target_key, value in latest_fields:
+                if entry.get(target_key) != value:
+                    entry[target_key] = value
+                    changed = True
         return changed
 
+    def _snapshot_index(self, key: int, registrations: list[Any]) -> dict[str, int]:
+        """Map snapshot ids to their position in ``registrations``, rebuilt when it changed."""
+
+        cached = self._snapshot_positions.get(key)
+        if (
+            cached is not None
+            and cached[0] is registrations
+            and cached[1] == len(registrations)
+            and cached[2] == self._profile_versions.get(key, 0)
+        ):
+            return cached[3]
+        positions: dict[str, int] = {}
+        for index, existing in enumerate(registrations):
+            if isinstance(existing, dict):
+                positions.setdefault(existing.get("id"), index)
+        self._store_snapshot_index(key, registrations, positions)
+        return positions
+
+    def _store_snapshot_index(self, key: int, registrations: list[Any], positions: dict[str, int]) -> None:
+        version = self._profile_versions.get(key, 0)
+        self._snapshot_positions[key] = (registrations, len(registrations), version, positions)
+
+    def _touch_profile(self, key: int) -> None:
+        self._profile_versions[key] = self._profile_versions.get(key, 0) + 1
+
     def _remove_user_registration_snapshot(self, record: dict[str, Any]) -> bool:
         record_id = record.get("id")
         if record_id is None:
             return False
         record_id_str = str(record_id)
+        self._registration_timestamps.pop(record_id_str, None)
         identities = self._identity_keys(record.get("submitted_by_id"), record.get("chat_id"))
         if not identities:
             return False
@@ -971,6 +1316,9 @@ class ConfettiTelegramBot:
                 item for item in registrations if not (isinstance(item, dict) and item.get("id") == record_id_str)
             ]
             if len(registrations) != original_len:
+                self._snapshot_positions.pop(key, None)
+                self._touch_profile(key)
+                self._forget_collected_registrations(key)
                 changed = True
                 if registrations:
                     latest = registrations[-1]
@@ -986,12 +1334,46 @@ class ConfettiTelegramBot:
         user: Any | None,
         chat: Any | None,
     ) -> list[dict[str, Any]]:
+        """Return registration snapshots stored for the user and chat.
+
+        Snapshots are indexed by identity in ``user_profiles``, so this only
+        touches the records of the given user/chat, never the full list. The
+        result is cached until one of those profiles changes; callers must not
+        mutate it.
+        """
+
+        identity_keys = tuple(self._identity_keys(user, chat))
+        versions = tuple(self._profile_versions.get(key, 0) for key in identity_keys)
+        cached = self._collect_cache.get(identity_keys)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+        collected = self._merge_user_registrations(identity_keys)
+        cache = self._collect_cache
+        if cached is None and len(cache) >= self.COLLECT_CACHE_SIZE:
+            # Evict the oldest pair; dicts keep insertion order.
+            del cache[next(iter(cache))]
+        cache[identity_keys] = (versions, collected)
+        return collected
+
+    def _forget_collected_registrations(self, key: int) -> None:
+        """Drop every cached merge that includes the profile ``key``."""
+
+        cache = self._collect_cache
+        for identity_keys in [identity_keys for identity_keys in cache if key in identity_keys]:
+            del cache[identity_keys]
+
+    def _merge_user_registrations(self, identity_keys: tuple[int, ...]) -> list[dict[str, Any]]:
         records: dict[str, dict[str, Any]] = {}
-        profiles = self._persistent_store.setdefault("user_profiles", {})
-        if not isinstance(profiles, dict):
-            profiles = {}
-            self._persistent_store["user_profiles"] = profiles
-        for key in self._identity_keys(user, chat):
+        profiles = self._user_profiles
+        if len(identity_keys) == 1:
+            # Private chats: user and chat share one profile whose snapshots are
+            # already unique by id, so no merging is required.
+            entry = profiles.get(identity_keys[0])
+            registrations = entry.get("registrations") if isinstance(entry, dict) else None
+            if not isinstance(registrations, list):
+                return []
+            return [item for item in registrations if isinstance(item, dict) and item.get("id")]
+        for key in identity_keys:
             entry = profiles.get(key)
             if not isinstance(entry, dict):
                 continue
@@ -1038,7 +1420,7 @@ class ConfettiTelegramBot:
             return None
 
         try:
-            return AIORateLimiter()
+            return AIORateLimiter(max_retries=self.RATE_LIMIT_MAX_RETRIES)
         except RuntimeError as exc:  # pragma: no cover - depends on installation
             LOGGER.warning(
                 "Failed to initialise the AIORateLimiter: %s. Running without a rate limiter.",
@@ -1052,13 +1434,26 @@ class ConfettiTelegramBot:
     def _register_handlers(self, application: Application) -> None:
         """Attach all command and message handlers to ``application``."""
 
+        # Filters are shared by every state that accepts the same input, so each
+        # button label gets one ``filters.Regex`` instance.
+        button_filters: dict[str, Any] = {}
+
+        def button(label: str) -> Any:
+            button_filter = button_filters.get(label)
+            if button_filter is None:
+                button_filter = button_filters[label] = filters.Regex(self._exact_match_regex(label))
+            return button_filter
+
+        non_command = ~filters.COMMAND
+        text_input = filters.TEXT & non_command
+
         with warnings.catch_warnings():
             if PTBUserWarning is not None:
                 warnings.simplefilter("ignore", PTBUserWarning)
             conversation = ConversationHandler(
                 entry_points=[
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.REGISTRATION_BUTTON)),
+                        button(self.REGISTRATION_BUTTON),
                         self._start_registration,
                     )
                 ],
@@ -1066,85 +1461,85 @@ class ConfettiTelegramBot:
                 self.REGISTRATION_PROGRAM: [
                     CallbackQueryHandler(
                         self._registration_collect_program,
-                        pattern=r"^reg_program:\d+$",
+                        pattern=self.REG_PROGRAM_CALLBACK_PATTERN,
                     ),
                     CallbackQueryHandler(
                         self._registration_cancel_from_program,
-                        pattern=r"^reg_back:menu$",
+                        pattern=self.REG_BACK_CALLBACK_PATTERN,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._registration_cancel,
                     ),
                     MessageHandler(
-                        filters.TEXT & ~filters.COMMAND,
+                        text_input,
                         self._registration_prompt_program_buttons,
                     ),
                 ],
                 self.REGISTRATION_CHILD_NAME: [
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._registration_cancel,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.BACK_BUTTON)),
+                        button(self.BACK_BUTTON),
                         self._registration_back_to_program,
                     ),
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, self._registration_collect_child_name),
+                    MessageHandler(text_input, self._registration_collect_child_name),
                 ],
                 self.REGISTRATION_CLASS: [
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._registration_cancel,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.BACK_BUTTON)),
+                        button(self.BACK_BUTTON),
                         self._registration_back_to_child_name,
                     ),
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, self._registration_collect_class),
+                    MessageHandler(text_input, self._registration_collect_class),
                 ],
                 self.REGISTRATION_PHONE: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, self._registration_collect_phone_text),
+                    MessageHandler(text_input, self._registration_collect_phone_text),
                 ],
                 self.REGISTRATION_CONFIRM_DETAILS: [
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.REGISTRATION_CONFIRM_SAVED_BUTTON)),
+                        button(self.REGISTRATION_CONFIRM_SAVED_BUTTON),
                         self._registration_accept_saved_details,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.REGISTRATION_EDIT_DETAILS_BUTTON)),
+                        button(self.REGISTRATION_EDIT_DETAILS_BUTTON),
                         self._registration_request_details_update,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.BACK_BUTTON)),
+                        button(self.BACK_BUTTON),
                         self._registration_back_from_confirm,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._registration_cancel,
                     ),
                 ],
                 self.REGISTRATION_TIME_DECISION: [
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.REGISTRATION_KEEP_TIME_BUTTON)),
+                        button(self.REGISTRATION_KEEP_TIME_BUTTON),
                         self._registration_use_saved_time,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.REGISTRATION_NEW_TIME_BUTTON)),
+                        button(self.REGISTRATION_NEW_TIME_BUTTON),
                         self._registration_request_new_time,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.BACK_BUTTON)),
+                        button(self.BACK_BUTTON),
                         self._registration_back_from_time_decision,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._registration_cancel,
                     ),
                 ],
                 self.REGISTRATION_TIME: [
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.BACK_BUTTON)),
+                        button(self.BACK_BUTTON),
                         self._registration_back_from_time,
                     ),
                     MessageHandler(
@@ -1152,18 +1547,18 @@ class ConfettiTelegramBot:
                         self._registration_collect_time,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._registration_cancel,
                     ),
                 ],
                 self.REGISTRATION_PAYMENT: [
-                    MessageHandler(~filters.COMMAND, self._registration_collect_payment),
+                    MessageHandler(non_command, self._registration_collect_payment),
                 ],
                 },
                 fallbacks=[
                     CommandHandler("cancel", self._registration_cancel),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._registration_cancel,
                     ),
                 ],
@@ -1176,29 +1571,29 @@ class ConfettiTelegramBot:
             cancellation = ConversationHandler(
                 entry_points=[
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.CANCELLATION_BUTTON)),
+                        button(self.CANCELLATION_BUTTON),
                         self._start_cancellation,
                     )
                 ],
                 states={
                 self.CANCELLATION_PROGRAM: [
                     MessageHandler(
-                        filters.TEXT & ~filters.COMMAND,
+                        text_input,
                         self._cancellation_collect_program,
                     ),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._cancellation_cancel,
                     ),
                 ],
                 self.CANCELLATION_REASON: [
-                    MessageHandler(~filters.COMMAND, self._cancellation_collect_reason),
+                    MessageHandler(non_command, self._cancellation_collect_reason),
                 ],
                 },
                 fallbacks=[
                     CommandHandler("cancel", self._cancellation_cancel),
                     MessageHandler(
-                        filters.Regex(self._exact_match_regex(self.MAIN_MENU_BUTTON)),
+                        button(self.MAIN_MENU_BUTTON),
                         self._cancellation_cancel,
                     ),
                 ],
@@ -1210,25 +1605,30 @@ class ConfettiTelegramBot:
         application.add_handler(CommandHandler("admin", self._show_admin_menu))
         application.add_handler(conversation)
         application.add_handler(cancellation)
-        application.add_handler(CallbackQueryHandler(self._about_show_direction, pattern=r"^about:"))
-        application.add_handler(CallbackQueryHandler(self._teacher_show_profile, pattern=r"^teacher:"))
-        application.add_handler(MessageHandler(~filters.COMMAND, self._handle_message))
+        application.add_handler(CallbackQueryHandler(self._about_show_direction, pattern=self.ABOUT_CALLBACK_PATTERN))
+        application.add_handler(CallbackQueryHandler(self._teacher_show_profile, pattern=self.TEACHER_CALLBACK_PATTERN))
+        application.add_handler(MessageHandler(non_command, self._handle_message))
 
-    def _exact_match_regex(self, text: str) -> str:
-        return rf"^{re.escape(text)}$"
+    def _exact_match_regex(self, text: str) -> re.Pattern[str]:
+        return _exact_match_pattern(text)
 
-    def _time_regex(self) -> str:
+    def _time_regex(self) -> re.Pattern[str]:
         parts = [re.escape(option) for option in self.TIME_OF_DAY_OPTIONS]
-        return rf"^({'|'.join(parts)})$"
+        return re.compile(rf"^({'|'.join(parts)})$")
 
     # ------------------------------------------------------------------
     # Shared messaging helpers
 
     def _main_menu_markup(self, *, include_admin: bool = False) -> ReplyKeyboardMarkup:
-        keyboard = [list(row) for row in self.MAIN_MENU_LAYOUT]
-        if include_admin:
-            keyboard.append([self.ADMIN_MENU_BUTTON])
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        cache_key = "main_menu_admin" if include_admin else "main_menu"
+        markup = self._markup_cache.get(cache_key)
+        if markup is None:
+            # PTB accepts any nested sequence, so the class layout is used as is.
+            keyboard = self.MAIN_MENU_LAYOUT
+            if include_admin:
+                keyboard = (*keyboard, (self.ADMIN_MENU_BUTTON,))
+            markup = self._markup_cache[cache_key] = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        return markup
 
     def _main_menu_markup_for(
         self, update: Update, context: Optional[ContextTypes.DEFAULT_TYPE] = None
@@ -1236,18 +1636,21 @@ class ConfettiTelegramBot:
         return self._main_menu_markup(include_admin=self._is_admin_update(update, context))
 
     def _admin_menu_markup(self) -> ReplyKeyboardMarkup:
-        keyboard = [
-            [self.ADMIN_BACK_TO_USER_BUTTON],
-            [self.ADMIN_BROADCAST_BUTTON, self.ADMIN_EXPORT_TABLE_BUTTON],
-            [self.ADMIN_MANAGE_ADMINS_BUTTON],
-            [self.ADMIN_EDIT_SCHEDULE_BUTTON],
-            [self.ADMIN_EDIT_ABOUT_BUTTON],
-            [self.ADMIN_EDIT_TEACHERS_BUTTON],
-            [self.ADMIN_EDIT_ALBUM_BUTTON],
-            [self.ADMIN_EDIT_CONTACTS_BUTTON],
-            [self.ADMIN_EDIT_VOCABULARY_BUTTON],
-        ]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        markup = self._markup_cache.get("admin_menu")
+        if markup is None:
+            keyboard = [
+                [self.ADMIN_BACK_TO_USER_BUTTON],
+                [self.ADMIN_BROADCAST_BUTTON, self.ADMIN_EXPORT_TABLE_BUTTON],
+                [self.ADMIN_MANAGE_ADMINS_BUTTON],
+                [self.ADMIN_EDIT_SCHEDULE_BUTTON],
+                [self.ADMIN_EDIT_ABOUT_BUTTON],
+                [self.ADMIN_EDIT_TEACHERS_BUTTON],
+                [self.ADMIN_EDIT_ALBUM_BUTTON],
+                [self.ADMIN_EDIT_CONTACTS_BUTTON],
+                [self.ADMIN_EDIT_VOCABULARY_BUTTON],
+            ]
+            markup = self._markup_cache["admin_menu"] = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        return markup
 
     def _is_admin_identity(self, *, chat: Any | None = None, user: Any | None = None) -> bool:
         """Check whether either ``chat`` or ``user`` matches an admin id."""
@@ -1291,8 +1694,12 @@ class ConfettiTelegramBot:
 
         storage = self._application_data(context)
         candidates = storage.get("dynamic_admins")
+        if isinstance(candidates, set):
+            # Already normalised on load and kept in sync with the runtime ids by
+            # _store_dynamic_admin/_remove_dynamic_admin.
+            return candidates
         ids: set[int] = set()
-        if isinstance(candidates, (set, list, tuple)):
+        if isinstance(candidates, (list, tuple)):
             for candidate in candidates:
                 try:
                     ids.add(_coerce_chat_id(candidate))
@@ -1314,7 +1721,7 @@ class ConfettiTelegramBot:
         existing.add(admin_id)
         storage["dynamic_admins"] = existing
         self._runtime_admin_ids.add(admin_id)
-        self._save_persistent_state()
+        self._request_save()
         return existing
 
     def _remove_dynamic_admin(
@@ -1329,7 +1736,7 @@ class ConfettiTelegramBot:
         existing.remove(admin_id)
         storage["dynamic_admins"] = existing
         self._runtime_admin_ids.discard(admin_id)
-        self._save_persistent_state()
+        self._request_save()
         return True
 
     def _admin_manage_admins_instruction(
@@ -1360,7 +1767,7 @@ class ConfettiTelegramBot:
         chat_id = _coerce_chat_id_from_object(chat)
         if chat_id not in known:
             known.add(chat_id)
-            self._save_persistent_state()
+            self._request_save()
 
     def _get_known_chats(self, context: ContextTypes.DEFAULT_TYPE) -> set[int]:
         store = self._application_data(context).setdefault("known_chats", set())
@@ -1374,30 +1781,36 @@ class ConfettiTelegramBot:
                 except ValueError:
                     continue
             self._application_data(context)["known_chats"] = converted
-            self._save_persistent_state()
+            self._request_save()
             return converted
         converted: set[int] = set()
         self._application_data(context)["known_chats"] = converted
-        self._save_persistent_state()
+        self._request_save()
         return converted
 
     def _get_content(self, context: ContextTypes.DEFAULT_TYPE) -> BotContent:
         content = self._application_data(context).get("content")
+        # Legacy string blocks are upgraded once; later calls for the same object skip the scan.
+        if content is not None and content is self._checked_content:
+            return content
         if isinstance(content, BotContent):
             for field_name in self.CONTENT_LABELS:
                 block = getattr(content, field_name, None)
                 if isinstance(block, str):
                     setattr(content, field_name, ContentBlock(text=block))
+            self._checked_content = content
             return content
         if isinstance(content, dict):
             # Backward compatibility if someone serialised a dict previously.
             restored = self.content_template.copy()
             self._application_data(context)["content"] = restored
-            self._save_persistent_state()
+            self._request_save()
+            self._checked_content = restored
             return restored
         fresh = self.content_template.copy()
         self._application_data(context)["content"] = fresh
-        self._save_persistent_state()
+        self._request_save()
+        self._checked_content = fresh
         return fresh
 
     def _store_registration(
@@ -1452,7 +1865,7 @@ class ConfettiTelegramBot:
             needs_save = True
 
         if needs_save:
-            self._save_persistent_state()
+            self._request_save()
 
         return record
 
@@ -1476,36 +1889,31 @@ class ConfettiTelegramBot:
         if isinstance(value, datetime):
             return value
         if isinstance(value, str):
-            for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
-                try:
-                    return datetime.strptime(value, fmt)
-                except ValueError:
-                    continue
+            return _parse_timestamp_text(value)
         return None
 
-    async def _purge_expired_registrations(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def _purge_expired_registrations(
+        self, context: ContextTypes.DEFAULT_TYPE
+    ) -> list[dict[str, Any]]:
+        """Drop registrations older than a week and return the live list."""
+
         registrations = self._application_data(context).get("registrations")
         if not isinstance(registrations, list) or not registrations:
-            return
+            return []
 
         threshold = datetime.utcnow() - timedelta(days=7)
-        removed: list[dict[str, Any]] = []
-        for index in range(len(registrations) - 1, -1, -1):
-            record = registrations[index]
-            if not isinstance(record, dict):
-                continue
-            created_at = self._parse_record_timestamp(record.get("created_at"))
-            if created_at is None:
-                continue
-            if created_at < threshold:
-                removed.append(registrations.pop(index))
-
-        if not removed:
-            return
-
-        if removed:
-            self._save_persistent_state()
-
+        parse = self._parse_record_timestamp
+        kept = [
+            record
+            for record in registrations
+            if not isinstance(record, dict)
+            or (created_at := parse(record.get("created_at"))) is None
+            or created_at >= threshold
+        ]
+        if len(kept) != len(registrations):
+            registrations[:] = kept
+            self._request_save()
+        return registrations
 
     async def _remove_registration_for_cancellation(
         self,
@@ -1608,7 +2016,7 @@ class ConfettiTelegramBot:
             record["removed_program"] = removed.get("program")
             record["removed_time"] = removed.get("time")
 
-        self._save_persistent_state()
+        self._request_save()
 
         admin_message = (
             "🚫 Отмена занятия\n"
@@ -1673,13 +2081,20 @@ class ConfettiTelegramBot:
 
         await self._send_greeting(update, context)
 
-    async def _show_main_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Show the menu without repeating the full greeting."""
+    async def _show_main_menu(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE, *, prefix: str = ""
+    ) -> None:
+        """Show the menu without repeating the full greeting.
+
+        ``prefix`` is sent in the same message, above the menu prompt.
+        """
 
         self._remember_chat(update, context)
         message = (
             "👉 Пожалуйста, выберите раздел в меню ниже."
         )
+        if prefix:
+            message = f"{prefix}\n\n{message}"
         if self._is_admin_update(update, context):
             message += "\n\n🛠 Для управления ботом откройте «Админ-панель» в меню."
         await self._reply(update, message, reply_markup=self._main_menu_markup_for(update, context))
@@ -1822,17 +2237,49 @@ class ConfettiTelegramBot:
         ] = None,
         media: Optional[list[MediaAttachment]] = None,
         prefer_edit: bool = False,
+    ) -> None:
+        delivery = self._throttled(
+            self._deliver_reply(
+                update,
+                text,
+                reply_markup=reply_markup,
+                media=media,
+                prefer_edit=prefer_edit,
+            )
+        )
+        callback = update.callback_query
+        if not callback:
+            await delivery
+            return
+
+        # Acknowledge the button press while the reply is being sent.
+        answered, delivered = await asyncio.gather(
+            callback.answer(), delivery, return_exceptions=True
+        )
+        if isinstance(answered, Exception):  # pragma: no cover - network/runtime specific
+            LOGGER.debug("Unable to answer callback query: %s", answered)
+        if isinstance(delivered, BaseException):
+            raise delivered
+
+    async def _throttled(self, operation: Awaitable[None]) -> None:
+        async with self._send_semaphore:
+            await operation
+
+    async def _deliver_reply(
+        self,
+        update: Update,
+        text: Optional[str],
+        *,
+        reply_markup: Optional[
+            ReplyKeyboardMarkup | ReplyKeyboardRemove | InlineKeyboardMarkup
+        ],
+        media: Optional[list[MediaAttachment]],
+        prefer_edit: bool,
     ) -> None:
         message = update.message
         callback = update.callback_query
         target = message or (callback.message if callback else None)
 
-        if callback:
-            try:
-                await callback.answer()
-            except Exception as exc:  # pragma: no cover - network/runtime specific
-                LOGGER.debug("Unable to answer callback query: %s", exc)
-
         markup_used = False
         inline_markup = reply_markup if reply_markup and hasattr(reply_markup, "inline_keyboard") else None
 
@@ -1963,6 +2410,9 @@ class ConfettiTelegramBot:
             return "", []
 
         text = (getattr(message, "text", None) or "").strip()
+        # Button presses resolve to the interned label, so later comparisons
+        # succeed on identity.
+        text = self._button_labels.get(text, text)
         caption = (getattr(message, "caption", None) or "").strip()
         remaining_caption = caption or None
         attachments: list[MediaAttachment] = []
@@ -2009,32 +2459,33 @@ class ConfettiTelegramBot:
         media: Optional[list[MediaAttachment]] = None,
         reply_markup: Optional[ReplyKeyboardMarkup | ReplyKeyboardRemove] = None,
     ) -> None:
-        if text:
-            await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
-            reply_markup = None
-        if not media:
-            return
-        for index, attachment in enumerate(media):
-            extra: dict[str, Any] = {}
-            if attachment.caption:
-                extra["caption"] = attachment.caption
-            if reply_markup is not None and index == 0:
-                extra["reply_markup"] = reply_markup
-            try:
-                if attachment.kind == "photo":
-                    await context.bot.send_photo(chat_id=chat_id, photo=attachment.file_id, **extra)
-                elif attachment.kind == "video":
-                    await context.bot.send_video(chat_id=chat_id, video=attachment.file_id, **extra)
-                elif attachment.kind == "animation":
-                    await context.bot.send_animation(chat_id=chat_id, animation=attachment.file_id, **extra)
-                elif attachment.kind == "document":
-                    await context.bot.send_document(chat_id=chat_id, document=attachment.file_id, **extra)
-                elif attachment.kind == "video_note":
-                    await context.bot.send_video_note(chat_id=chat_id, video_note=attachment.file_id)
-                else:
-                    LOGGER.debug("Unsupported media type %s for broadcast", attachment.kind)
-            except Exception as exc:  # pragma: no cover - network dependent
-                LOGGER.warning("Failed to deliver media %s to %s: %s", attachment.kind, chat_id, exc)
+        async with self._send_semaphore:
+            if text:
+                await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+                reply_markup = None
+            if not media:
+                return
+            for index, attachment in enumerate(media):
+                extra: dict[str, Any] = {}
+                if attachment.caption:
+                    extra["caption"] = attachment.caption
+                if reply_markup is not None and index == 0:
+                    extra["reply_markup"] = reply_markup
+                try:
+                    if attachment.kind == "photo":
+                        await context.bot.send_photo(chat_id=chat_id, photo=attachment.file_id, **extra)
+                    elif attachment.kind == "video":
+                        await context.bot.send_video(chat_id=chat_id, video=attachment.file_id, **extra)
+                    elif attachment.kind == "animation":
+                        await context.bot.send_animation(chat_id=chat_id, animation=attachment.file_id, **extra)
+                    elif attachment.kind == "document":
+                        await context.bot.send_document(chat_id=chat_id, document=attachment.file_id, **extra)
+                    elif attachment.kind == "video_note":
+                        await context.bot.send_video_note(chat_id=chat_id, video_note=attachment.file_id)
+                    else:
+                        LOGGER.debug("Unsupported media type %s for broadcast", attachment.kind)
+                except Exception as exc:  # pragma: no cover - network dependent
+                    LOGGER.warning("Failed to deliver media %s to %s: %s", attachment.kind, chat_id, exc)
 
     async def _notify_admins(
         self,
@@ -2043,70 +2494,56 @@ class ConfettiTelegramBot:
         *,
         media: Optional[list[MediaAttachment]] = None,
     ) -> None:
-        recipients = set(self._runtime_admin_ids)
-        recipients.update(self._refresh_admin_cache(context))
-        for admin_id in sorted(recipients):
-            try:
-                await self._send_payload_to_chat(context, admin_id, text=text, media=media)
-            except Exception as exc:  # pragma: no cover - network dependent
-                LOGGER.warning("Failed to notify admin %s: %s", admin_id, exc)
+        recipients = sorted(set(self._runtime_admin_ids).union(self._refresh_admin_cache(context)))
+        if not recipients:
+            return
+        results = await asyncio.gather(
+            *(
+                self._send_payload_to_chat(context, admin_id, text=text, media=media)
+                for admin_id in recipients
+            ),
+            return_exceptions=True,
+        )
+        for admin_id, result in zip(recipients, results):
+            if isinstance(result, Exception):  # pragma: no cover - network dependent
+                LOGGER.warning("Failed to notify admin %s: %s", admin_id, result)
 
     def _attachments_to_dicts(self, attachments: list[MediaAttachment]) -> list[dict[str, str]]:
-        serialised: list[dict[str, str]] = []
+        payloads: list[dict[str, str]] = []
         for attachment in attachments:
-            serialised.append(
-                {
-                    "kind": attachment.kind,
-                    "file_id": attachment.file_id,
-                    "caption": attachment.caption or "",
-                    "preview_base64": attachment.preview_base64 or "",
-                    "preview_mime": attachment.preview_mime or "",
-                }
-            )
-        return serialised
+            payload = {
+                "kind": attachment.kind,
+                "file_id": attachment.file_id,
+                "caption": attachment.caption or "",
+            }
+            # Previews are optional; empty placeholders only bloat the state file.
+            if attachment.preview_base64:
+                payload["preview_base64"] = attachment.preview_base64
+                payload["preview_mime"] = attachment.preview_mime or ""
+            payloads.append(payload)
+        return payloads
 
     def _dicts_to_attachments(self, payload: Any) -> list[MediaAttachment]:
-        attachments: list[MediaAttachment] = []
         if not isinstance(payload, list):
-            return attachments
-        for entry in payload:
-            if not isinstance(entry, dict):
-                continue
-            kind = entry.get("kind")
-            file_id = entry.get("file_id")
-            if not kind or not file_id:
-                continue
-            caption = entry.get("caption") or None
-            preview_base64 = entry.get("preview_base64") or None
-            preview_mime = entry.get("preview_mime") or None
-            attachments.append(
-                MediaAttachment(
-                    kind=kind,
-                    file_id=file_id,
-                    caption=caption,
-                    preview_base64=preview_base64,
-                    preview_mime=preview_mime,
-                )
+            return []
+        return [
+            MediaAttachment(
+                kind=entry["kind"],
+                file_id=entry["file_id"],
+                caption=entry.get("caption") or None,
+                preview_base64=entry.get("preview_base64") or None,
+                preview_mime=entry.get("preview_mime") or None,
             )
-        return attachments
+            for entry in payload
+            if isinstance(entry, dict) and entry.get("kind") and entry.get("file_id")
+        ]
 
     async def _serialise_payment_media(
         self, context: ContextTypes.DEFAULT_TYPE, attachments: list[MediaAttachment]
     ) -> list[dict[str, str]]:
         """Convert payment attachments to a JSON-friendly structure."""
 
-        serialised: list[dict[str, str]] = []
-        for attachment in attachments:
-            serialised.append(
-                {
-                    "kind": attachment.kind,
-                    "file_id": attachment.file_id,
-                    "caption": attachment.caption or "",
-                    "preview_base64": attachment.preview_base64 or "",
-                    "preview_mime": attachment.preview_mime or "",
-                }
-            )
-        return serialised
+        return self._attachments_to_dicts(attachments)
 
     # ------------------------------------------------------------------
     # Registration conversation
@@ -2130,46 +2567,51 @@ class ConfettiTelegramBot:
         return self.REGISTRATION_PROGRAM
 
     def _program_inline_keyboard(self) -> "InlineKeyboardMarkup":
-        buttons = [
-            [InlineKeyboardButton(program["label"], callback_data=f"reg_program:{index}")]
-            for index, program in enumerate(self.PROGRAMS)
-        ]
-        buttons.append([InlineKeyboardButton(self.BACK_BUTTON, callback_data="reg_back:menu")])
-        return InlineKeyboardMarkup(buttons)
+        markup = self._markup_cache.get("programs")
+        if markup is None:
+            buttons = [
+                [InlineKeyboardButton(program["label"], callback_data=f"reg_program:{index}")]
+                for index, program in enumerate(self.PROGRAMS)
+            ]
+            buttons.append([InlineKeyboardButton(self.BACK_BUTTON, callback_data="reg_back:menu")])
+            markup = self._markup_cache["programs"] = InlineKeyboardMarkup(buttons)
+        return markup
 
     def _about_inline_keyboard(self) -> "InlineKeyboardMarkup":
-        buttons = [
-            [InlineKeyboardButton(program["label"], callback_data=f"about:{index}")]
-            for index, program in enumerate(self.PROGRAMS)
-        ]
-        buttons.append([InlineKeyboardButton(self.BACK_BUTTON, callback_data="about:home")])
-        return InlineKeyboardMarkup(buttons)
+        markup = self._markup_cache.get("about")
+        if markup is None:
+            buttons = [
+                [InlineKeyboardButton(program["label"], callback_data=f"about:{index}")]
+                for index, program in enumerate(self.PROGRAMS)
+            ]
+            buttons.append([InlineKeyboardButton(self.BACK_BUTTON, callback_data="about:home")])
+            markup = self._markup_cache["about"] = InlineKeyboardMarkup(buttons)
+        return markup
 
     def _teacher_inline_keyboard(self) -> "InlineKeyboardMarkup":
-        buttons = [
-            [InlineKeyboardButton(teacher["name"], callback_data=f"teacher:{teacher['key']}")]
-            for teacher in self.TEACHERS
-        ]
-        buttons.append([InlineKeyboardButton(self.BACK_BUTTON, callback_data="teacher:home")])
-        return InlineKeyboardMarkup(buttons)
+        markup = self._markup_cache.get("teachers")
+        if markup is None:
+            buttons = [
+                [InlineKeyboardButton(teacher["name"], callback_data=f"teacher:{teacher['key']}")]
+                for teacher in self.TEACHERS
+            ]
+            buttons.append([InlineKeyboardButton(self.BACK_BUTTON, callback_data="teacher:home")])
+            markup = self._markup_cache["teachers"] = InlineKeyboardMarkup(buttons)
+        return markup
 
     def _format_program_details(self, program: Dict[str, str]) -> str:
-        lines = [program["label"]]
         description = program.get("description")
-        if description:
-            lines.append("")
-            lines.append(description)
-        for key in ("audience", "teacher", "schedule"):
-            value = program.get(key)
-            if value:
-                lines.append(value)
-        return "\n".join(line for line in lines if line is not None)
+        head = f"{program['label']}\n\n{description}" if description else program["label"]
+        extras = "\n".join(
+            value for value in (program.get(key) for key in ("audience", "teacher", "schedule")) if value
+        )
+        return f"{head}\n{extras}" if extras else head
 
     def _resolve_program_teacher(self, program_label: str) -> str:
-        for program in self.PROGRAMS:
-            if program.get("label") == program_label:
-                return program.get("teacher", "") or ""
-        return ""
+        program = self.PROGRAMS_BY_LABEL.get(program_label)
+        if program is None:
+            return ""
+        return program.get("teacher", "") or ""
 
     async def _registration_prompt_program_buttons(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -2187,6 +2629,7 @@ class ConfettiTelegramBot:
         message = update.message
 
         program_label = ""
+        prefix = ""
         selected_program: Optional[dict[str, str]] = None
         if query is not None:
             data = query.data or ""
@@ -2199,30 +2642,32 @@ class ConfettiTelegramBot:
                 await query.answer("Программа недоступна.", show_alert=True)
                 return self.REGISTRATION_PROGRAM
             program = self.PROGRAMS[index]
-            await query.answer()
             program_label = program["label"]
-            details = self._format_program_details(program)
+            # The callback query is answered by ``_reply`` together with the next
+            # prompt; when the confirmation cannot replace the program list it is
+            # prepended to that prompt instead of being sent separately.
+            selected_message = self._program_selected_messages[index]
+            prefix = selected_message
             if query.message is not None:
                 try:  # pragma: no cover - depends on telegram runtime
-                    await query.edit_message_text(f"Вы выбрали программу:\n{details}")
+                    await query.edit_message_text(selected_message)
                 except Exception:
                     try:
                         await query.edit_message_reply_markup(None)
                     except Exception:
                         pass
-                    await self._reply(update, f"Вы выбрали программу:\n{details}")
-            else:
-                await self._reply(update, f"Вы выбрали программу:\n{details}")
+                else:
+                    prefix = ""
             selected_program = program
         else:
             program_label = (message.text if message else "").strip()
-            program = next((item for item in self.PROGRAMS if item["label"] == program_label), None)
+            program = self.PROGRAMS_BY_LABEL.get(program_label)
             if not program:
                 await self._registration_prompt_program_buttons(update, context)
                 return self.REGISTRATION_PROGRAM
             selected_program = program
 
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         registration["program"] = program_label
         teacher = (selected_program or {}).get("teacher") or self._resolve_program_teacher(program_label)
         if teacher:
@@ -2231,14 +2676,10 @@ class ConfettiTelegramBot:
             registration.pop("teacher", None)
 
         defaults = self._get_user_defaults(update.effective_user)
-        if defaults:
-            for key in ("child_name", "class", "phone"):
-                value = defaults.get(key)
-                if value:
-                    registration[key] = value
+        user_records = self._collect_user_registrations(update.effective_user, update.effective_chat)
+        from_defaults = self._prefill_registration_details(registration, defaults, user_records)
 
         saved_time = ""
-        user_records = self._collect_user_registrations(update.effective_user, update.effective_chat)
         for record in reversed(user_records):
             if record.get("program") == program_label and record.get("time"):
                 saved_time = str(record.get("time"))
@@ -2253,20 +2694,51 @@ class ConfettiTelegramBot:
             registration["saved_time"] = saved_time
 
         if not registration.get("child_name"):
-            return await self._registration_prompt_child_name(update, context)
+            return await self._registration_prompt_child_name(update, context, prefix=prefix)
 
         if not registration.get("class"):
-            return await self._registration_prompt_class(update, context, remind=True)
+            return await self._registration_prompt_class(update, context, remind=True, prefix=prefix)
 
         if not registration.get("phone"):
-            return await self._registration_prompt_phone(update, context, remind=True)
+            return await self._registration_prompt_phone(update, context, remind=True, prefix=prefix)
 
-        return await self._registration_show_saved_details_prompt(update, context)
+        if not from_defaults:
+            # The details were typed in during this registration (the user went
+            # back to the program list), so there is nothing saved to confirm.
+            return await self._prompt_time_of_day(update, context, prefix=prefix)
+
+        return await self._registration_show_saved_details_prompt(update, context, prefix=prefix)
+
+    @staticmethod
+    def _prefill_registration_details(
+        registration: dict[str, Any],
+        defaults: dict[str, str],
+        user_records: Sequence[dict[str, Any]],
+    ) -> bool:
+        """Fill the child's details from the latest snapshot, falling back to the profile.
+
+        Returns ``True`` when at least one value was prefilled.
+        """
+
+        latest = user_records[-1] if user_records else {}
+        prefilled = False
+        for key in ("child_name", "class", "phone"):
+            # Snapshots carry no phone number, so that one always comes from the profile.
+            value = latest.get(key) or defaults.get(key)
+            if value:
+                registration[key] = value
+                prefilled = True
+        return prefilled
 
     async def _registration_prompt_child_name(
-        self, update: Update, context: ContextTypes.DEFAULT_TYPE, *, remind: bool = False
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        *,
+        remind: bool = False,
+        prefix: str = "",
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         if remind and registration.get("child_name"):
             message = (
                 f"Сейчас указано имя: {registration.get('child_name', '—')}.\n"
@@ -2274,13 +2746,20 @@ class ConfettiTelegramBot:
             )
         else:
             message = "Отлично! Напишите, пожалуйста, имя и фамилию ребёнка."
+        if prefix:
+            message = f"{prefix}\n\n{message}"
         await self._reply(update, message, reply_markup=self._back_keyboard())
         return self.REGISTRATION_CHILD_NAME
 
     async def _registration_prompt_class(
-        self, update: Update, context: ContextTypes.DEFAULT_TYPE, *, remind: bool = False
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        *,
+        remind: bool = False,
+        prefix: str = "",
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         child_name = registration.get("child_name", "—")
         if remind and registration.get("class"):
             message = (
@@ -2290,13 +2769,20 @@ class ConfettiTelegramBot:
             )
         else:
             message = f"Мы сохранили имя: {child_name}.\nУкажите, пожалуйста, класс."
+        if prefix:
+            message = f"{prefix}\n\n{message}"
         await self._reply(update, message, reply_markup=self._back_keyboard())
         return self.REGISTRATION_CLASS
 
     async def _registration_prompt_phone(
-        self, update: Update, context: ContextTypes.DEFAULT_TYPE, *, remind: bool = False
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        *,
+        remind: bool = False,
+        prefix: str = "",
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         child_name = registration.get("child_name", "—")
         child_class = registration.get("class", "—")
         if remind and registration.get("phone"):
@@ -2310,19 +2796,23 @@ class ConfettiTelegramBot:
                 f"Мы сохранили имя и класс: {child_name} ({child_class}).\n"
                 "Введите номер телефона вручную."
             )
+        if prefix:
+            message = f"{prefix}\n\n{message}"
         await self._reply(update, message, reply_markup=self._phone_keyboard())
         return self.REGISTRATION_PHONE
 
     async def _registration_show_saved_details_prompt(
-        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE, *, prefix: str = ""
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         message = (
             "Мы заполнили данные из вашей предыдущей заявки:\n"
             f"👦 Имя: {registration.get('child_name', '—')} ({registration.get('class', '—')})\n"
             f"📱 Телефон: {registration.get('phone', '—')}\n\n"
             "Нажмите «Продолжить», если всё верно, или «Изменить данные», чтобы указать новые значения."
         )
+        if prefix:
+            message = f"{prefix}\n\n{message}"
         await self._reply(update, message, reply_markup=self._saved_details_keyboard())
         return self.REGISTRATION_CONFIRM_DETAILS
 
@@ -2344,7 +2834,7 @@ class ConfettiTelegramBot:
     async def _registration_back_to_program(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         for key in ("program", "teacher", "time", "saved_time", "saved_time_original", "proposed_time"):
             registration.pop(key, None)
         await self._reply(
@@ -2367,14 +2857,14 @@ class ConfettiTelegramBot:
     async def _registration_back_from_time_decision(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         registration.pop("proposed_time", None)
         return await self._registration_show_saved_details_prompt(update, context)
 
     async def _registration_back_from_time(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         registration.pop("time", None)
         if registration.get("saved_time_original"):
             registration["saved_time"] = registration["saved_time_original"]
@@ -2384,64 +2874,108 @@ class ConfettiTelegramBot:
     async def _registration_back_to_time(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         registration.pop("payment_media", None)
         registration.pop("payment_note", None)
         return await self._registration_back_from_time(update, context)
 
-    async def _registration_collect_child_name(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        text = (update.message.text or "").strip()
+    def _registration_data(self, context: ContextTypes.DEFAULT_TYPE) -> dict[str, Any]:
+        """Return the in-progress registration form of the current user."""
+
+        user_data = context.user_data
+        registration = user_data.get("registration")
+        if registration is None:
+            registration = user_data["registration"] = {}
+        return registration
+
+    async def _handle_nav_text(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        text: Optional[str],
+        *,
+        back: Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[int]],
+        cancel: Optional[Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[int]]] = None,
+    ) -> Optional[int]:
+        """Handle the shared main-menu and back buttons of a conversation step."""
+
         if text == self.MAIN_MENU_BUTTON:
-            return await self._registration_cancel(update, context)
+            return await (cancel or self._registration_cancel)(update, context)
         if text == self.BACK_BUTTON:
-            return await self._registration_back_to_program(update, context)
-        context.user_data.setdefault("registration", {})["child_name"] = text
+            return await back(update, context)
+        return None
+
+    async def _registration_collect_child_name(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        text = (update.message.text or "").strip()
+        result = await self._handle_nav_text(update, context, text, back=self._registration_back_to_program)
+        if result is not None:
+            return result
+        self._registration_data(context)["child_name"] = text
         return await self._registration_prompt_class(update, context)
 
     async def _registration_collect_class(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         text = (update.message.text or "").strip()
-        if text == self.MAIN_MENU_BUTTON:
-            return await self._registration_cancel(update, context)
-        if text == self.BACK_BUTTON:
-            return await self._registration_prompt_child_name(update, context, remind=True)
-        context.user_data.setdefault("registration", {})["class"] = text
+        result = await self._handle_nav_text(update, context, text, back=self._registration_back_to_child_name)
+        if result is not None:
+            return result
+        self._registration_data(context)["class"] = text
         return await self._registration_prompt_phone(update, context)
 
     def _back_keyboard(self, *, include_menu: bool = True) -> ReplyKeyboardMarkup:
-        row = [KeyboardButton(self.BACK_BUTTON)]
-        if include_menu:
-            row.append(KeyboardButton(self.MAIN_MENU_BUTTON))
-        return ReplyKeyboardMarkup([row], resize_keyboard=True, one_time_keyboard=True)
+        cache_key = "back_menu" if include_menu else "back"
+        markup = self._markup_cache.get(cache_key)
+        if markup is None:
+            row = [KeyboardButton(self.BACK_BUTTON)]
+            if include_menu:
+                row.append(KeyboardButton(self.MAIN_MENU_BUTTON))
+            markup = self._markup_cache[cache_key] = ReplyKeyboardMarkup(
+                [row], resize_keyboard=True, one_time_keyboard=True
+            )
+        return markup
 
     def _phone_keyboard(self) -> ReplyKeyboardMarkup:
         return self._back_keyboard()
 
     def _admin_action_keyboard(self) -> ReplyKeyboardMarkup:
-        keyboard = [
-            [KeyboardButton(self.BACK_BUTTON), KeyboardButton(self.ADMIN_MENU_BUTTON)],
-            [KeyboardButton(self.MAIN_MENU_BUTTON)],
-        ]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+        markup = self._markup_cache.get("admin_action")
+        if markup is None:
+            keyboard = [
+                [KeyboardButton(self.BACK_BUTTON), KeyboardButton(self.ADMIN_MENU_BUTTON)],
+                [KeyboardButton(self.MAIN_MENU_BUTTON)],
+            ]
+            markup = self._markup_cache["admin_action"] = ReplyKeyboardMarkup(
+                keyboard, resize_keyboard=True, one_time_keyboard=True
+            )
+        return markup
 
     def _saved_details_keyboard(self) -> ReplyKeyboardMarkup:
-        keyboard = [
-            [KeyboardButton(self.REGISTRATION_CONFIRM_SAVED_BUTTON)],
-            [KeyboardButton(self.REGISTRATION_EDIT_DETAILS_BUTTON)],
-            [KeyboardButton(self.BACK_BUTTON), KeyboardButton(self.MAIN_MENU_BUTTON)],
-        ]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+        markup = self._markup_cache.get("saved_details")
+        if markup is None:
+            keyboard = [
+                [KeyboardButton(self.REGISTRATION_CONFIRM_SAVED_BUTTON)],
+                [KeyboardButton(self.REGISTRATION_EDIT_DETAILS_BUTTON)],
+                [KeyboardButton(self.BACK_BUTTON), KeyboardButton(self.MAIN_MENU_BUTTON)],
+            ]
+            markup = self._markup_cache["saved_details"] = ReplyKeyboardMarkup(
+                keyboard, resize_keyboard=True, one_time_keyboard=True
+            )
+        return markup
 
     def _payment_keyboard(self) -> ReplyKeyboardMarkup:
-        keyboard = [[KeyboardButton(self.BACK_BUTTON), KeyboardButton(self.MAIN_MENU_BUTTON)]]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+        return self._back_keyboard()
 
     def _saved_time_keyboard(self) -> ReplyKeyboardMarkup:
-        keyboard = [
-            [KeyboardButton(self.REGISTRATION_KEEP_TIME_BUTTON)],
-            [KeyboardButton(self.REGISTRATION_NEW_TIME_BUTTON)],
-            [KeyboardButton(self.BACK_BUTTON), KeyboardButton(self.MAIN_MENU_BUTTON)],
-        ]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+        markup = self._markup_cache.get("saved_time")
+        if markup is None:
+            keyboard = [
+                [KeyboardButton(self.REGISTRATION_KEEP_TIME_BUTTON)],
+                [KeyboardButton(self.REGISTRATION_NEW_TIME_BUTTON)],
+                [KeyboardButton(self.BACK_BUTTON), KeyboardButton(self.MAIN_MENU_BUTTON)],
+            ]
+            markup = self._markup_cache["saved_time"] = ReplyKeyboardMarkup(
+                keyboard, resize_keyboard=True, one_time_keyboard=True
+            )
+        return markup
 
     def _cancellation_keyboard(self, labels: list[str]) -> ReplyKeyboardMarkup:
         keyboard = [[label] for label in labels]
@@ -2452,11 +2986,12 @@ class ConfettiTelegramBot:
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
         text = update.message.text.strip()
-        if text == self.MAIN_MENU_BUTTON:
-            return await self._registration_cancel(update, context)
-        if text == self.BACK_BUTTON:
-            return await self._registration_prompt_class(update, context, remind=True)
-        context.user_data.setdefault("registration", {})["phone"] = text
+        result = await self._handle_nav_text(
+            update, context, text, back=partial(self._registration_prompt_class, remind=True)
+        )
+        if result is not None:
+            return result
+        self._registration_data(context)["phone"] = text
         return await self._prompt_time_of_day(update, context)
 
     async def _registration_accept_saved_details(
@@ -2467,7 +3002,7 @@ class ConfettiTelegramBot:
     async def _registration_use_saved_time(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         saved_time = str(
             registration.get("proposed_time")
             or registration.get("saved_time")
@@ -2484,7 +3019,7 @@ class ConfettiTelegramBot:
     async def _registration_request_new_time(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         original = registration.get("saved_time") or registration.get("saved_time_original")
         if original:
             registration["saved_time_original"] = original
@@ -2495,15 +3030,15 @@ class ConfettiTelegramBot:
     async def _registration_request_details_update(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         for key in ("child_name", "class", "phone"):
             registration.pop(key, None)
         return await self._registration_prompt_child_name(update, context, remind=True)
 
     async def _prompt_time_of_day(
-        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE, *, prefix: str = ""
     ) -> int:
-        registration = context.user_data.setdefault("registration", {})
+        registration = self._registration_data(context)
         saved_time = str(registration.get("saved_time", "")).strip()
         if saved_time:
             registration.setdefault("saved_time_original", saved_time)
@@ -2513,34 +3048,43 @@ class ConfettiTelegramBot:
                 f"{saved_time}.\n"
                 "🔁 Нажмите «То же время», чтобы оставить его, или «Другое время», чтобы выбрать новый слот."
             )
+            if prefix:
+                message = f"{prefix}\n\n{message}"
             await self._reply(
                 update,
                 message,
                 reply_markup=self._saved_time_keyboard(),
             )
             return self.REGISTRATION_TIME_DECISION
-        return await self._prompt_time_selection(update)
+        return await self._prompt_time_selection(update, prefix=prefix)
 
-    async def _prompt_time_selection(self, update: Update) -> int:
+    async def _prompt_time_selection(self, update: Update, *, prefix: str = "") -> int:
+        message = "Выберите удобное время занятий."
+        if prefix:
+            message = f"{prefix}\n\n{message}"
         await self._reply(
             update,
-            "Выберите удобное время занятий.",
+            message,
             reply_markup=self._time_keyboard(),
         )
         return self.REGISTRATION_TIME
 
     def _time_keyboard(self) -> ReplyKeyboardMarkup:
-        keyboard = [[option] for option in self.TIME_OF_DAY_OPTIONS]
-        keyboard.append([self.BACK_BUTTON, self.MAIN_MENU_BUTTON])
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+        markup = self._markup_cache.get("time")
+        if markup is None:
+            keyboard = [[option] for option in self.TIME_OF_DAY_OPTIONS]
+            keyboard.append([self.BACK_BUTTON, self.MAIN_MENU_BUTTON])
+            markup = self._markup_cache["time"] = ReplyKeyboardMarkup(
+                keyboard, resize_keyboard=True, one_time_keyboard=True
+            )
+        return markup
 
     async def _registration_collect_time(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         text = (update.message.text or "").strip()
-        if text == self.MAIN_MENU_BUTTON:
-            return await self._registration_cancel(update, context)
-        if text == self.BACK_BUTTON:
-            return await self._registration_back_from_time(update, context)
-        registration = context.user_data.setdefault("registration", {})
+        result = await self._handle_nav_text(update, context, text, back=self._registration_back_from_time)
+        if result is not None:
+            return result
+        registration = self._registration_data(context)
         registration["time"] = text
         if not registration.get("saved_time_original"):
             registration["saved_time_original"] = text
@@ -2567,14 +3111,12 @@ class ConfettiTelegramBot:
     async def _registration_collect_payment(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
-        data = context.user_data.setdefault("registration", {})
+        data = self._registration_data(context)
         text, attachments = self._extract_message_payload(update.message)
 
-        if text == self.MAIN_MENU_BUTTON:
-            return await self._registration_cancel(update, context)
-
-        if text == self.BACK_BUTTON:
-            return await self._registration_back_to_time(update, context)
+        result = await self._handle_nav_text(update, context, text, back=self._registration_back_to_time)
+        if result is not None:
+            return result
 
         if text:
             data["payment_note"] = text
@@ -2598,7 +3140,6 @@ class ConfettiTelegramBot:
         data["payment_media"] = await self._serialise_payment_media(context, attachments)
 
         await self._send_registration_summary(update, context, media=attachments or None)
-        await self._show_main_menu(update, context)
         return ConversationHandler.END
 
     async def _registration_cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -2618,19 +3159,10 @@ class ConfettiTelegramBot:
         await self._purge_expired_registrations(context)
         records = self._collect_user_registrations(update.effective_user, update.effective_chat)
         if not records:
-            await self._reply(
-                update,
-                "ℹ️ Активных записей не найдено.",
-                reply_markup=self._main_menu_markup_for(update, context),
-            )
-            await self._show_main_menu(update, context)
+            await self._show_main_menu(update, context, prefix="ℹ️ Активных записей не найдено.")
             return ConversationHandler.END
 
-        sorted_records = sorted(
-            records,
-            key=lambda item: self._parse_record_timestamp(item.get("created_at")) or datetime.min,
-            reverse=True,
-        )
+        sorted_records = sorted(records, key=self._registration_sort_key, reverse=True)
         options: dict[str, dict[str, Any]] = {}
         counts: dict[str, int] = {}
         for record in sorted_records:
@@ -2671,10 +3203,11 @@ class ConfettiTelegramBot:
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> int:
         payload = update.message.text.strip()
-        if payload == self.MAIN_MENU_BUTTON:
-            return await self._cancellation_cancel(update, context)
-        if payload == self.BACK_BUTTON:
-            return await self._cancellation_cancel(update, context)
+        result = await self._handle_nav_text(
+            update, context, payload, back=self._cancellation_cancel, cancel=self._cancellation_cancel
+        )
+        if result is not None:
+            return result
 
         data = context.user_data.setdefault("cancellation", {})
         options: dict[str, dict[str, Any]] = data.get("options", {})  # type: ignore[assignment]
@@ -2725,11 +3258,16 @@ class ConfettiTelegramBot:
         data = context.user_data.setdefault("cancellation", {})
         text, attachments = self._extract_message_payload(update.message)
 
-        if text == self.MAIN_MENU_BUTTON:
-            return await self._cancellation_cancel(update, context)
-        if text == self.BACK_BUTTON:
-            options: dict[str, dict[str, Any]] = data.get("options", {})  # type: ignore[assignment]
-            return await self._cancellation_restart_program(update, context, options)
+        options: dict[str, dict[str, Any]] = data.get("options", {})  # type: ignore[assignment]
+        result = await self._handle_nav_text(
+            update,
+            context,
+            text,
+            back=partial(self._cancellation_restart_program, options=options),
+            cancel=self._cancellation_cancel,
+        )
+        if result is not None:
+            return result
 
         if attachments:
             data["evidence"] = self._attachments_to_dicts(attachments)
@@ -2742,12 +3280,7 @@ class ConfettiTelegramBot:
             "✅ Отмена зафиксирована.\n"
             "ℹ️ Средства за пропущенное занятие не возвращаются, но мы учли ваш комментарий."
         )
-        await self._reply(
-            update,
-            confirmation,
-            reply_markup=self._main_menu_markup_for(update, context),
-        )
-        await self._show_main_menu(update, context)
+        await self._show_main_menu(update, context, prefix=confirmation)
         return ConversationHandler.END
 
     async def _cancellation_cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -2787,7 +3320,7 @@ class ConfettiTelegramBot:
             summary += f"📝 Комментарий: {payment_note}\n"
         summary += "\nМы свяжемся с вами в ближайшее время."
 
-        await self._reply(update, summary, reply_markup=self._main_menu_markup_for(update, context))
+        await self._show_main_menu(update, context, prefix=summary)
         record = self._store_registration(update, context, data, attachments)
 
         admin_message = (
@@ -2823,14 +3356,17 @@ class ConfettiTelegramBot:
             await self._show_main_menu(update, context)
             return
 
-        profile = self.build_profile(update.effective_chat, update.effective_user)
+        # Only the admin flag is needed here; skip building a profile object.
+        is_admin = self._is_admin_identity(chat=update.effective_chat, user=update.effective_user)
         pending = context.chat_data.get("pending_admin_action")
 
-        if pending and profile.is_admin:
+        if pending and is_admin:
             trimmed = text.strip() if text else ""
-            lowered = trimmed.lower()
 
-            if trimmed == self.BACK_BUTTON or lowered in self._admin_cancel_tokens:
+            if trimmed == self.BACK_BUTTON or (
+                len(trimmed) <= self.ADMIN_CANCEL_MAX_LENGTH
+                and trimmed.casefold() in self.ADMIN_CANCEL_TOKENS
+            ):
                 context.chat_data.pop("pending_admin_action", None)
                 await self._reply(
                     update,
@@ -2859,82 +3395,10 @@ class ConfettiTelegramBot:
             )
             return
 
-        if profile.is_admin and text:
-            command_text = text.strip()
-            if command_text == self.ADMIN_MENU_BUTTON:
-                await self._show_admin_menu(update, context)
-                return
-            if command_text == self.ADMIN_BACK_TO_USER_BUTTON:
-                await self._show_main_menu(update, context)
-                return
-            if command_text == self.ADMIN_BROADCAST_BUTTON:
-                context.chat_data["pending_admin_action"] = {"type": "broadcast"}
-                await self._reply(
-                    update,
-                    "Отправьте сообщение или медиа для рассылки."
-                    + self.ADMIN_CANCEL_PROMPT,
-                    reply_markup=self._admin_action_keyboard(),
-                )
-                return
-            if command_text == self.ADMIN_EXPORT_TABLE_BUTTON:
-                await self._admin_share_registrations_table(update, context)
-                return
-            if command_text == self.ADMIN_MANAGE_ADMINS_BUTTON:
-                context.chat_data["pending_admin_action"] = {"type": "manage_admins"}
-                message = self._admin_manage_admins_instruction(context)
-                await self._reply(
-                    update,
-                    message + self.ADMIN_CANCEL_PROMPT,
-                    reply_markup=self._admin_action_keyboard(),
-                )
-                return
-            if command_text == self.ADMIN_EDIT_SCHEDULE_BUTTON:
-                await self._prompt_admin_content_edit(
-                    update,
-                    context,
-                    field="schedule",
-                    instruction="Отправьте текст и вложения нового расписания."
-                    + self.ADMIN_CANCEL_PROMPT,
-                )
-                return
-            if command_text == self.ADMIN_EDIT_ABOUT_BUTTON:
-                await self._prompt_admin_content_edit(
-                    update,
-                    context,
-                    field="about",
-                    instruction="Отправьте обновлённый блок «О студии» (текст, фото, видео)."
-                    + self.ADMIN_CANCEL_PROMPT,
-                )
-                return
-            if command_text == self.ADMIN_EDIT_TEACHERS_BUTTON:
-                await self._prompt_admin_content_edit(
-                    update,
-                    context,
-                    field="teachers",
-                    instruction="Поделитесь новым описанием преподавателей и медиа."
-                    + self.ADMIN_CANCEL_PROMPT,
-                )
-                return
-            if command_text == self.ADMIN_EDIT_ALBUM_BUTTON:
-                await self._prompt_admin_content_edit(
-                    update,
-                    context,
-                    field="album",
-                    instruction="Отправьте ссылку или материалы для фотоальбома."
-                    + self.ADMIN_CANCEL_PROMPT,
-                )
-                return
-            if command_text == self.ADMIN_EDIT_CONTACTS_BUTTON:
-                await self._prompt_admin_content_edit(
-                    update,
-                    context,
-                    field="contacts",
-                    instruction="Введите обновлённые контакты (при необходимости с медиа)."
-                    + self.ADMIN_CANCEL_PROMPT,
-                )
-                return
-            if command_text == self.ADMIN_EDIT_VOCABULARY_BUTTON:
-                await self._prompt_admin_vocabulary_edit(update, context)
+        if is_admin and text:
+            action = self.ADMIN_BUTTON_ACTIONS.get(text.strip())
+            if action is not None:
+                await self._run_admin_button_action(update, context, action)
                 return
 
         if text:
@@ -2948,6 +3412,26 @@ class ConfettiTelegramBot:
                 reply_markup=self._main_menu_markup_for(update, context),
             )
 
+    async def _run_admin_button_action(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        action: tuple[str, str, str],
+    ) -> None:
+        kind, target, prompt = action
+        if kind == "call":
+            await getattr(self, target)(update, context)
+            return
+        if kind == "edit":
+            await self._prompt_admin_content_edit(update, context, field=target, instruction=prompt)
+            return
+        if kind == "broadcast":
+            context.chat_data["pending_admin_action"] = {"type": "broadcast"}
+        else:
+            context.chat_data["pending_admin_action"] = {"type": "manage_admins"}
+            prompt = self._admin_manage_admins_instruction(context) + prompt
+        await self._reply(update, prompt, reply_markup=self._admin_action_keyboard())
+
     async def _dispatch_admin_action(
         self,
         update: Update,
@@ -3117,8 +3601,7 @@ class ConfettiTelegramBot:
         field: str,
         instruction: str,
     ) -> None:
-        content = self._get_content(context)
-        if not hasattr(content, field):
+        if field not in self.EDITABLE_CONTENT_FIELDS:
             await self._reply(
                 update,
                 "Этот раздел нельзя редактировать.",
@@ -3126,7 +3609,7 @@ class ConfettiTelegramBot:
             )
             return
         context.chat_data["pending_admin_action"] = {"type": "edit_content", "field": field}
-        current_block = getattr(content, field)
+        current_block = getattr(self._get_content(context), field)
         if isinstance(current_block, ContentBlock):
             text_preview = current_block.text or "(текста нет)"
             media_note = (
@@ -3149,20 +3632,14 @@ class ConfettiTelegramBot:
     ) -> None:
         content = self._get_content(context)
         context.chat_data["pending_admin_action"] = {"type": "edit_vocabulary"}
-        serialized_entries = []
-        for entry in content.vocabulary:
-            serialized_entries.append(
-                "|".join(
-                    [
-                        entry.get("word", ""),
-                        entry.get("emoji", ""),
-                        entry.get("translation", ""),
-                        entry.get("example_fr", ""),
-                        entry.get("example_ru", ""),
-                    ]
-                )
+        fields = self.VOCABULARY_FIELDS
+        sample = (
+            "\n".join(
+                "|".join(entry.get(field_name, "") for field_name in fields)
+                for entry in content.vocabulary
             )
-        sample = "\n".join(serialized_entries) if serialized_entries else "(пока нет записей)"
+            or "(пока нет записей)"
+        )
         message = (
             "Отправьте новые слова в формате: слово|эмодзи|перевод|пример FR|пример RU."
             "\nКаждое слово — на отдельной строке."
@@ -3190,20 +3667,27 @@ class ConfettiTelegramBot:
             )
             return
 
-        successes = 0
-        failures: list[str] = []
-        for chat_id in sorted(known_chats):
-            try:
-                await self._send_payload_to_chat(
-                    context,
-                    chat_id,
-                    text=message if message else None,
-                    media=attachments or None,
-                )
-                successes += 1
-            except Exception as exc:  # pragma: no cover - network dependent
-                LOGGER.warning("Failed to send broadcast to %s: %s", chat_id, exc)
-                failures.append(str(chat_id))
+        semaphore = asyncio.Semaphore(self.BROADCAST_CONCURRENCY)
+
+        async def deliver(chat_id: int) -> Optional[Exception]:
+            async with semaphore:
+                try:
+                    await self._send_payload_to_chat(
+                        context,
+                        chat_id,
+                        text=message if message else None,
+                        media=attachments or None,
+                    )
+                except Exception as exc:  # pragma: no cover - network dependent
+                    LOGGER.warning("Failed to send broadcast to %s: %s", chat_id, exc)
+                    return exc
+            return None
+
+        recipients = tuple(known_chats)
+        results = await asyncio.gather(*(deliver(chat_id) for chat_id in recipients))
+        failed = sorted(chat_id for chat_id, error in zip(recipients, results) if error is not None)
+        failures = [str(chat_id) for chat_id in failed]
+        successes = len(recipients) - len(failures)
 
         result = f"Рассылка завершена: {successes} из {len(known_chats)} чатов."
         if failures:
@@ -3213,9 +3697,8 @@ class ConfettiTelegramBot:
     async def _admin_share_registrations_table(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> None:
-        await self._purge_expired_registrations(context)
-        registrations = self._application_data(context).get("registrations", [])
-        if not isinstance(registrations, list) or not registrations:
+        registrations = await self._purge_expired_registrations(context)
+        if not registrations:
             await self._reply(
                 update,
                 "Заявок пока нет.",
@@ -3229,40 +3712,33 @@ class ConfettiTelegramBot:
             registrations,
             bot_username=bot_username,
         )
-        export_path, generated_at = self._export_registrations_excel(
+        export_path, generated_at = await self._export_registrations_excel(
             context,
             table_rows,
         )
         sheet_result = await self._sync_google_sheet(table_rows)
         preview_lines = self._format_registrations_preview(registrations)
 
-        message_parts = [
-            "📊 Экспорт заявок готов!\n",
-            f"🗂 Всего записей: {len(registrations)}",
-            f"🕒 Обновлено: {generated_at}",
-        ]
-        if preview_lines:
-            message_parts.append("")
-            message_parts.extend(preview_lines)
         if sheet_result.url:
-            message_parts.append("")
-            message_parts.append(f"🌐 Живая таблица: {sheet_result.url}")
-            if sheet_result.updated:
-                message_parts.append(
-                    "Таблица обновлена автоматически и содержит актуальные данные."
-                )
-            else:
-                message_parts.append(
-                    "⚠️ Не удалось обновить таблицу автоматически. Проверьте доступ Google Sheets; ссылка ведёт на последнюю доступную версию."
-                )
+            sheet_parts: tuple[str, ...] = (
+                f"🌐 Живая таблица: {sheet_result.url}",
+                "Таблица обновлена автоматически и содержит актуальные данные."
+                if sheet_result.updated
+                else "⚠️ Не удалось обновить таблицу автоматически. Проверьте доступ Google Sheets; ссылка ведёт на последнюю доступную версию.",
+            )
         else:
-            message_parts.append("")
-            message_parts.append(
-                "⚠️ Облачная таблица недоступна: проверьте настройки сервисного аккаунта."
+            sheet_parts = (
+                "⚠️ Облачная таблица недоступна: проверьте настройки сервисного аккаунта.",
             )
-        message_parts.append("")
-        message_parts.append(
-            "🔗 В столбце «Фото оплаты» размещены кликабельные ссылки на подтверждения платежей."
+        message_parts = (
+            "📊 Экспорт заявок готов!\n",
+            f"🗂 Всего записей: {len(registrations)}",
+            f"🕒 Обновлено: {generated_at}",
+            *(("", *preview_lines) if preview_lines else ()),
+            "",
+            *sheet_parts,
+            "",
+            "🔗 В столбце «Фото оплаты» размещены кликабельные ссылки на подтверждения платежей.",
         )
 
         await self._reply(
@@ -3325,37 +3801,71 @@ class ConfettiTelegramBot:
 
         return rows
 
-    def _export_registrations_excel(
+    async def _export_registrations_excel(
         self,
         context: ContextTypes.DEFAULT_TYPE,
         table_rows: Sequence[Sequence[_XlsxCell]],
     ) -> tuple[Path, str]:
+        export_path = Path("data") / "exports" / "confetti_registrations.xlsx"
+        async with self._export_lock:
+            digest = self._table_rows_digest(table_rows)
+            storage = self._application_data(context)
+            exports_meta = storage.setdefault("exports", {})
+            previous = exports_meta.get("registrations") if isinstance(exports_meta, dict) else None
+            if (
+                isinstance(previous, dict)
+                and previous.get("digest") == digest
+                and previous.get("path") == str(export_path)
+                and previous.get("generated_at")
+                and export_path.exists()
+            ):
+                return export_path, str(previous["generated_at"])
+
+            generated_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+            # XML rendering and deflate are CPU/disk bound; keep them off the event loop.
+            # The builder swaps the finished file into place, so the digest below only
+            # ever describes a complete workbook.
+            await asyncio.to_thread(self._write_registrations_workbook, export_path, table_rows)
+
+            registrations_meta = {
+                "generated_at": generated_at,
+                "path": str(export_path),
+                "digest": digest,
+            }
+            if isinstance(exports_meta, dict):
+                exports_meta["registrations"] = registrations_meta
+            else:
+                storage["exports"] = {"registrations": registrations_meta}
+
+            self._request_save()
+
+        return export_path, generated_at
+
+    def _write_registrations_workbook(
+        self, export_path: Path, table_rows: Sequence[Sequence[_XlsxCell]]
+    ) -> None:
         builder = _SimpleXlsxBuilder(
             sheet_name="Заявки",
             column_widths=self.EXPORT_COLUMN_WIDTHS,
         )
+        builder.write_rows(export_path, table_rows)
 
-        for row in table_rows:
-            builder.add_row(row)
-
-        generated_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
-        export_path = Path("data") / "exports" / "confetti_registrations.xlsx"
-        builder.to_file(export_path)
-
-        storage = self._application_data(context)
-        exports_meta = storage.setdefault("exports", {})
-        registrations_meta = {
-            "generated_at": generated_at,
-            "path": str(export_path),
-        }
-        if isinstance(exports_meta, dict):
-            exports_meta["registrations"] = registrations_meta
-        else:
-            storage["exports"] = {"registrations": registrations_meta}
-
-        self._save_persistent_state()
+    @staticmethod
+    def _table_rows_digest(table_rows: Sequence[Sequence[_XlsxCell]]) -> str:
+        """Fingerprint the export rows so an unchanged table is not rebuilt."""
 
-        return export_path, generated_at
+        digest = hashlib.blake2b(digest_size=16)
+        for row in table_rows:
+            for cell in row:
+                digest.update(cell.text.encode("utf-8"))
+                digest.update(b"\x1f")
+                if cell.formula:
+                    digest.update(cell.formula.encode("utf-8"))
+                if cell.image is not None:
+                    digest.update(cell.image.data)
+                digest.update(b"\x1e")
+            digest.update(b"\x1d")
+        return digest.hexdigest()
 
     def _ensure_google_sheets_exporter(self) -> Optional["_GoogleSheetsExporter"]:
         if self._google_sheets_exporter is not None:
@@ -3368,14 +3878,14 @@ class ConfettiTelegramBot:
         self,
         table_rows: Sequence[Sequence[_XlsxCell]],
     ) -> _GoogleSheetSyncResult:
-        exporter = self._ensure_google_sheets_exporter()
+        # Credential discovery reads files and the API client blocks on HTTP
+        # (including its retry sleeps), so both run in a worker thread.
+        exporter = await asyncio.to_thread(self._ensure_google_sheets_exporter)
         if exporter is None:
             return _GoogleSheetSyncResult(url=None, updated=False)
 
-        loop = asyncio.get_running_loop()
         try:
-            url = await loop.run_in_executor(
-                None,
+            url = await asyncio.to_thread(
                 exporter.sync,
                 table_rows,
                 tuple(self.EXPORT_COLUMN_WIDTHS),
@@ -3619,8 +4129,10 @@ class ConfettiTelegramBot:
 
         attachments: list[MediaAttachment] = []
         cleaned_lines: list[str] = []
+        match_directive = self.MEDIA_DIRECTIVE_PATTERN.match
         for raw_line in text.splitlines():
-            directive = self.MEDIA_DIRECTIVE_PATTERN.match(raw_line.strip())
+            # Every directive carries an http(s) URL, so plain text lines skip the regex.
+            directive = "://" in raw_line and match_directive(raw_line.strip())
             if directive:
                 kind = directive.group("kind").lower()
                 url = directive.group("url")
@@ -3650,19 +4162,16 @@ class ConfettiTelegramBot:
         attachments: list[MediaAttachment],
     ) -> None:
         cleaned_text, url_attachments = self._extract_media_directives(text)
-        combined_media = [
-            MediaAttachment(kind=item.kind, file_id=item.file_id, caption=item.caption)
-            for item in attachments
-        ]
-        combined_media.extend(url_attachments)
-        content = self._get_content(context)
-        if not hasattr(content, field):
+        # Attachments are freshly extracted from this message, so they can be stored as-is.
+        combined_media = [*attachments, *url_attachments]
+        if field not in self.EDITABLE_CONTENT_FIELDS:
             await self._reply(
                 update,
                 "Этот раздел нельзя редактировать.",
                 reply_markup=self._admin_menu_markup(),
             )
             return
+        content = self._get_content(context)
         block = getattr(content, field)
         new_block = ContentBlock(
             text=cleaned_text.strip(),
@@ -3684,7 +4193,7 @@ class ConfettiTelegramBot:
             f"🛠 Раздел «{label}» был обновлён администратором.",
             media=combined_media or None,
         )
-        self._save_persistent_state()
+        self._request_save()
 
     async def _admin_apply_vocabulary_update(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE, payload: str
@@ -3699,26 +4208,18 @@ class ConfettiTelegramBot:
             )
             return False
 
-        entries: list[dict[str, str]] = []
-        for line in lines:
-            parts = [part.strip() for part in line.split("|")]
-            if len(parts) != 5:
-                await self._reply(
-                    update,
-                    "Неверный формат. Используйте 5 частей через вертикальную черту."
-                    + self.ADMIN_CANCEL_PROMPT,
-                    reply_markup=self._admin_action_keyboard(),
-                )
-                return False
-            entries.append(
-                {
-                    "word": parts[0],
-                    "emoji": parts[1],
-                    "translation": parts[2],
-                    "example_fr": parts[3],
-                    "example_ru": parts[4],
-                }
+        split = self.VOCABULARY_SEPARATOR_PATTERN.split
+        fields = self.VOCABULARY_FIELDS
+        rows = [split(line) for line in lines]
+        if any(len(parts) != len(fields) for parts in rows):
+            await self._reply(
+                update,
+                "Неверный формат. Используйте 5 частей через вертикальную черту."
+                + self.ADMIN_CANCEL_PROMPT,
+                reply_markup=self._admin_action_keyboard(),
             )
+            return False
+        entries = [dict(zip(fields, parts)) for parts in rows]
 
         content = self._get_content(context)
         content.vocabulary = entries
@@ -3727,30 +4228,21 @@ class ConfettiTelegramBot:
             f"Обновлено слов: {len(entries)}.",
             reply_markup=self._admin_menu_markup(),
         )
-        self._save_persistent_state()
+        self._request_save()
         return True
 
 
     async def _handle_menu_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         text = (update.message.text or "").strip()
-        handlers = {
-            "📅 Расписание": self._send_schedule,
-            "ℹ️ О студии": self._send_about,
-            "👩‍🏫 Преподаватели": self._send_teachers,
-            self.REGISTRATION_LIST_BUTTON: self._send_registration_list,
-            "📞 Контакты": self._send_contacts,
-            "📚 Полезные слова": self._send_vocabulary,
-        }
-
-        handler = handlers.get(text)
-        if handler is None:
+        handler_name = self.MENU_HANDLERS.get(text)
+        if handler_name is None:
             await self._reply(
                 update,
                 "Пожалуйста, воспользуйтесь меню внизу экрана.",
                 reply_markup=self._main_menu_markup_for(update, context),
             )
             return
-        await handler(update, context)
+        await getattr(self, handler_name)(update, context)
 
     async def _send_content_block(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE, block: ContentBlock
@@ -3807,6 +4299,33 @@ class ConfettiTelegramBot:
             prefer_edit=update.callback_query is not None,
         )
 
+    def _format_registration_entry(self, record: dict[str, Any], index: int) -> str:
+        """Render one registration as a block for the "my registrations" list."""
+
+        # Snapshot values are normalised to strings when stored or loaded.
+        program, child, grade, time_slot, created_at, payment_note = [
+            record.get(name) or "" for name in self.REGISTRATION_LIST_FIELDS
+        ]
+        details = " • ".join(
+            part
+            for part in (
+                child,
+                f"класс: {grade}" if grade else "",
+                f"время: {time_slot}" if time_slot else "",
+            )
+            if part
+        )
+        if record.get("payment_media"):
+            payment = "подтверждение во вложении"
+        else:
+            payment = payment_note or "ожидается"
+        return (
+            f"{index}. {program or 'Без программы'}"
+            + (f"\n{details}" if details else "")
+            + (f"\n📅 Заявка от: {created_at}" if created_at else "")
+            + f"\n💳 Оплата: {payment}"
+        )
+
     async def _send_registration_list(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ) -> None:
@@ -3821,43 +4340,12 @@ class ConfettiTelegramBot:
             )
             return
 
-        sorted_records = sorted(
-            records,
-            key=lambda item: self._parse_record_timestamp(item.get("created_at")) or datetime.min,
-            reverse=True,
-        )
-
-        lines: list[str] = []
-        for index, record in enumerate(sorted_records, start=1):
-            program = str(record.get("program", "")) or "Без программы"
-            child = str(record.get("child_name", ""))
-            grade = str(record.get("class", ""))
-            time_slot = str(record.get("time", ""))
-            created_at = str(record.get("created_at", ""))
-            payment_note = str(record.get("payment_note", ""))
-            payment_media = record.get("payment_media") or []
-
-            entry_lines = [f"{index}. {program}"]
-            details: list[str] = []
-            if child:
-                details.append(child)
-            if grade:
-                details.append(f"класс: {grade}")
-            if time_slot:
-                details.append(f"время: {time_slot}")
-            if details:
-                entry_lines.append(" • ".join(details))
-            if created_at:
-                entry_lines.append(f"📅 Заявка от: {created_at}")
-            if payment_media:
-                entry_lines.append("💳 Оплата: подтверждение во вложении")
-            elif payment_note:
-                entry_lines.append(f"💳 Оплата: {payment_note}")
-            else:
-                entry_lines.append("💳 Оплата: ожидается")
-            lines.append("\n".join(entry_lines))
+        sorted_records = sorted(records, key=self._registration_sort_key, reverse=True)
 
-        text = "📋 Ваши заявки:\n\n" + "\n\n".join(lines)
+        text = "📋 Ваши заявки:\n\n" + "\n\n".join(
+            self._format_registration_entry(record, index)
+            for index, record in enumerate(sorted_records, start=1)
+        )
         await self._reply(update, text, reply_markup=reply_markup)
 
     async def _send_teachers(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -3899,16 +4387,14 @@ class ConfettiTelegramBot:
             return
         key = data[1]
         if key == "home":
-            await query.answer()
             await self._send_teachers(update, context)
             return
 
-        teacher = next((item for item in self.TEACHERS if item["key"] == key), None)
+        teacher = self.TEACHERS_BY_KEY.get(key)
         if teacher is None:
             await query.answer("Педагог не найден.", show_alert=True)
             return
 
-        await query.answer()
         caption = f"{teacher['name']}\n\n{teacher['description']}"
         keyboard = self._teacher_inline_keyboard()
         photo_reference = self._resolve_media_reference(
@@ -3929,7 +4415,7 @@ class ConfettiTelegramBot:
                         caption=caption,
                     )
                 ],
-                prefer_edit=update.callback_query is not None,
+                prefer_edit=True,
             )
             return
 
@@ -3954,7 +4440,6 @@ class ConfettiTelegramBot:
 
         key = data[1]
         if key == "home":
-            await query.answer()
             await self._send_about(update, context)
             return
 
@@ -3969,9 +4454,8 @@ class ConfettiTelegramBot:
             return
 
         program = self.PROGRAMS[index]
-        await query.answer()
-
-        overview = self._format_program_details(program)
+        overview = self._program_details[index]
+        keyboard = self._about_inline_keyboard()
         photo_reference = self._resolve_media_reference(
             program,
             file_key="photo_file_id",
@@ -3981,7 +4465,7 @@ class ConfettiTelegramBot:
             await self._reply(
                 update,
                 text=None,
-                reply_markup=self._about_inline_keyboard(),
+                reply_markup=keyboard,
                 media=[
                     MediaAttachment(
                         kind="photo",
@@ -3989,14 +4473,14 @@ class ConfettiTelegramBot:
                         caption=overview,
                     )
                 ],
-                prefer_edit=update.callback_query is not None,
+                prefer_edit=True,
             )
             return
 
         await self._reply(
             update,
             overview + "\n\n",
-            reply_markup=self._about_inline_keyboard(),
+            reply_markup=keyboard,
             prefer_edit=True,
         )
 
@@ -4018,14 +4502,28 @@ class ConfettiTelegramBot:
                 reply_markup=self._main_menu_markup_for(update, context),
             )
             return
-        entry = random.choice(content.vocabulary)
-        text = (
+        rendered = self._rendered_vocabulary(content.vocabulary)
+        text = rendered[random.randrange(len(rendered))]
+        await self._reply(update, text, reply_markup=self._main_menu_markup_for(update, context))
+
+    def _rendered_vocabulary(self, vocabulary: list[dict[str, str]]) -> list[str]:
+        """Return the "word of the day" cards, rendered once per vocabulary list."""
+
+        # Admin edits and state loads assign a new list, which invalidates the cache.
+        source, rendered = self._vocabulary_cache
+        if source is not vocabulary:
+            rendered = [self._render_vocabulary_entry(entry) for entry in vocabulary]
+            self._vocabulary_cache = (vocabulary, rendered)
+        return rendered
+
+    @staticmethod
+    def _render_vocabulary_entry(entry: dict[str, str]) -> str:
+        return (
             "🎁 Mot du jour / Слово дня :\n\n"
             f"🇫🇷 {entry.get('word', '—')} {entry.get('emoji', '')}\n"
             f"🇷🇺 {entry.get('translation', '—')}\n\n"
             f"💬 Exemple : {entry.get('example_fr', '—')} — {entry.get('example_ru', '—')}"
         )
-        await self._reply(update, text, reply_markup=self._main_menu_markup_for(update, context))
 
 
 @dataclass(frozen=True)
@@ -4081,8 +4579,76 @@ class _XlsxCell:
         return cls(text=text, formula=formula)
 
 
+_XML_ESCAPE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+_XML_TEXT_ESCAPE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\n": "&#10;"})
+_XML_ATTR_ESCAPE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+_SHEET_NAME_FORBIDDEN_PATTERN = re.compile(r"[\\/*?:\[\]]")
+
+# Workbook parts that never change between exports, pre-encoded for ``ZipFile.writestr``.
+_XLSX_ROOT_RELS = (
+    b"<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
+    b"<Relationships xmlns=\"http://schemas.openxmlformats.org/package/2006/relationships\">"
+    b"<Relationship Id=\"rId1\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument\" Target=\"xl/workbook.xml\"/>"
+    b"</Relationships>"
+)
+_XLSX_WORKBOOK_RELS = (
+    b"<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
+    b"<Relationships xmlns=\"http://schemas.openxmlformats.org/package/2006/relationships\">"
+    b"<Relationship Id=\"rId1\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet\" Target=\"worksheets/sheet1.xml\"/>"
+    b"<Relationship Id=\"rId2\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles\" Target=\"styles.xml\"/>"
+    b"<Relationship Id=\"rId3\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings\" Target=\"sharedStrings.xml\"/>"
+    b"</Relationships>"
+)
+_XLSX_STYLES = (
+    b"<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
+    b"<styleSheet xmlns=\"http://schemas.openxmlformats.org/spreadsheetml/2006/main\">"
+    b"<fonts count=\"2\">"
+    b"<font><sz val=\"11\"/><color theme=\"1\"/><name val=\"Calibri\"/><family val=\"2\"/></font>"
+    b"<font><b/><sz val=\"11\"/><color theme=\"1\"/><name val=\"Calibri\"/><family val=\"2\"/></font>"
+    b"</fonts>"
+    b"<fills count=\"1\"><fill><patternFill patternType=\"none\"/></fill></fills>"
+    b"<borders count=\"1\"><border><left/><right/><top/><bottom/><diagonal/></border></borders>"
+    b"<cellStyleXfs count=\"1\"><xf numFmtId=\"0\" fontId=\"0\" fillId=\"0\" borderId=\"0\"/></cellStyleXfs>"
+    b"<cellXfs count=\"3\">"
+    b"<xf numFmtId=\"0\" fontId=\"0\" fillId=\"0\" borderId=\"0\" xfId=\"0\"/>"
+    b"<xf numFmtId=\"0\" fontId=\"1\" fillId=\"0\" borderId=\"0\" xfId=\"0\" applyFont=\"1\"/>"
+    b"<xf numFmtId=\"0\" fontId=\"0\" fillId=\"0\" borderId=\"0\" xfId=\"0\" applyAlignment=\"1\"><alignment wrapText=\"1\"/></xf>"
+    b"</cellXfs>"
+    b"<cellStyles count=\"1\"><cellStyle name=\"Normal\" xfId=\"0\" builtinId=\"0\"/></cellStyles>"
+    b"</styleSheet>"
+)
+_XLSX_SHEET_RELS = (
+    b"<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
+    b"<Relationships xmlns=\"http://schemas.openxmlformats.org/package/2006/relationships\">"
+    b"<Relationship Id=\"rId1\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing\" Target=\"../drawings/drawing1.xml\"/>"
+    b"</Relationships>"
+)
+
+
+@lru_cache(maxsize=1024)
+def _column_letter(index: int) -> str:
+    """Return the spreadsheet column name (``A``, ``B``, … ``AA``) for ``index``."""
+
+    result = ""
+    while index >= 0:
+        index, remainder = divmod(index, 26)
+        result = chr(65 + remainder) + result
+        index -= 1
+    return result
+
+
 class _SimpleXlsxBuilder:
-    """Minimal XLSX writer for structured admin exports."""
+    """Minimal XLSX writer for structured admin exports.
+
+    Rows are written straight into the compressed worksheet entry as they
+    arrive, so memory does not grow with the export size; cell texts are
+    stored once in the shared strings table.
+    """
+
+    # Encoded rows are batched into writes of roughly this many bytes.
+    FLUSH_THRESHOLD = 64 * 1024
+    # Exports are regenerated on demand, so favour write speed over a few percent of size.
+    COMPRESS_LEVEL = 3
 
     def __init__(
         self,
@@ -4091,60 +4657,103 @@ class _SimpleXlsxBuilder:
         column_widths: Optional[Iterable[float]] = None,
     ) -> None:
         self.sheet_name = self._sanitise_sheet_name(sheet_name)
-        self.rows: list[list[_XlsxCell]] = []
         self.column_widths: list[float] = [float(width) for width in column_widths] if column_widths else []
         self._image_anchors: list[tuple[int, int, _XlsxImage]] = []
+        self._stream: Optional[IO[bytes]] = None
+        self._row_count = 0
+        self._shared_strings: dict[str, int] = {}
+        self._shared_string_refs = 0
+        self._row_buffer = bytearray()
 
     def add_row(self, values: Iterable[Any]) -> None:
-        row: list[_XlsxCell] = []
-        for value in values:
-            row.append(self._normalise_cell(value))
-        self.rows.append(row)
+        if self._stream is None:
+            raise RuntimeError("Rows can only be added while the workbook is open.")
+        self._write_row([self._normalise_cell(value) for value in values])
 
-    def to_file(self, path: Path) -> None:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        sheet_xml = self._sheet()
-        with ZipFile(path, "w", ZIP_DEFLATED) as archive:
-            archive.writestr("[Content_Types].xml", self._content_types())
-            archive.writestr("_rels/.rels", self._rels_root())
-            archive.writestr("xl/workbook.xml", self._workbook())
-            archive.writestr("xl/_rels/workbook.xml.rels", self._workbook_rels())
-            archive.writestr("xl/styles.xml", self._styles())
-            archive.writestr("xl/worksheets/sheet1.xml", sheet_xml)
-            if self._image_anchors:
-                archive.writestr("xl/worksheets/_rels/sheet1.xml.rels", self._sheet_rels())
-                archive.writestr("xl/drawings/drawing1.xml", self._drawing())
-                archive.writestr("xl/drawings/_rels/drawing1.xml.rels", self._drawing_rels())
-                for index, (_, _, image) in enumerate(self._image_anchors, start=1):
-                    archive.writestr(
-                        f"xl/media/image{index}.{image.extension}",
-                        image.data,
-                    )
+    def write_rows(self, path: Path, rows: Iterable[Iterable[Any]]) -> None:
+        """Write ``rows`` to ``path``; ``rows`` may be a lazy iterator and is consumed."""
 
-    def _sheet(self) -> str:
-        rows_xml: list[str] = []
-        image_anchors: list[tuple[int, int, _XlsxImage]] = []
-        for row_index, row in enumerate(self.rows, start=1):
-            cells: list[str] = []
-            for column_index, value in enumerate(row):
-                cell_reference = f"{self._column_letter(column_index)}{row_index}"
-                style_index = 1 if row_index == 1 else 2
-                style_attr = f' s="{style_index}"'
-                text = escape(value.text, {"\n": "&#10;"})
-                if value.formula:
-                    formula = escape(value.formula)
-                    cells.append(
-                        f'<c r="{cell_reference}" t="str"{style_attr}><f>{formula}</f><v>{text}</v></c>'
-                    )
-                else:
-                    cells.append(
-                        f'<c r="{cell_reference}" t="inlineStr"{style_attr}><is><t>{text}</t></is></c>'
-                    )
-                if value.image is not None and row_index > 1:
-                    image_anchors.append((row_index - 1, column_index, value.image))
-            rows_xml.append(f'<row r="{row_index}">{"".join(cells)}</row>')
+        with self.open(path):
+            for values in rows:
+                self.add_row(values)
+
+    @contextmanager
+    def open(self, path: Path) -> Iterator["_SimpleXlsxBuilder"]:
+        """Write the workbook to ``path``, streaming rows added in the block."""
 
-        sheet_data = "".join(rows_xml)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._image_anchors = []
+        self._row_count = 0
+        self._shared_strings = {}
+        self._shared_string_refs = 0
+        self._row_buffer.clear()
+        # The archive is built next to the target and swapped in only once it
+        # is complete, so a failed export never leaves a truncated workbook.
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        try:
+            with ZipFile(tmp_path, "w", ZIP_DEFLATED, compresslevel=self.COMPRESS_LEVEL) as archive:
+                with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as stream:
+                    stream.write(self._sheet_header().encode("utf-8"))
+                    self._stream = stream
+                    try:
+                        yield self
+                    finally:
+                        self._stream = None
+                    stream.write(self._row_buffer)
+                    self._row_buffer.clear()
+                    stream.write(self._sheet_footer().encode("utf-8"))
+                archive.writestr("[Content_Types].xml", self._content_types())
+                archive.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+                archive.writestr("xl/workbook.xml", self._workbook())
+                archive.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+                archive.writestr("xl/styles.xml", _XLSX_STYLES)
+                archive.writestr("xl/sharedStrings.xml", self._shared_strings_xml())
+                if self._image_anchors:
+                    archive.writestr("xl/worksheets/_rels/sheet1.xml.rels", _XLSX_SHEET_RELS)
+                    archive.writestr("xl/drawings/drawing1.xml", self._drawing())
+                    archive.writestr("xl/drawings/_rels/drawing1.xml.rels", self._drawing_rels())
+                    for index, (_, _, image) in enumerate(self._image_anchors, start=1):
+                        archive.writestr(
+                            f"xl/media/image{index}.{image.extension}",
+                            image.data,
+                        )
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        tmp_path.replace(path)
+
+    def _write_row(self, row: Sequence[_XlsxCell]) -> None:
+        assert self._stream is not None
+        self._row_count += 1
+        row_index = self._row_count
+        style_attr = ' s="1"' if row_index == 1 else ' s="2"'
+        # Everything after the column letter is shared by the cells of this row.
+        string_cell = f'{row_index}" t="s"{style_attr}><v>'
+        formula_cell = f'{row_index}" t="str"{style_attr}><f>'
+        shared_strings = self._shared_strings
+        cells: list[str] = []
+        for column_index, value in enumerate(row):
+            if value.formula:
+                text = value.text.translate(_XML_TEXT_ESCAPE_TABLE)
+                formula = value.formula.translate(_XML_ESCAPE_TABLE)
+                cells.append(
+                    f'<c r="{_column_letter(column_index)}{formula_cell}{formula}</f><v>{text}</v></c>'
+                )
+            else:
+                string_index = shared_strings.get(value.text)
+                if string_index is None:
+                    string_index = shared_strings[value.text] = len(shared_strings)
+                self._shared_string_refs += 1
+                cells.append(f'<c r="{_column_letter(column_index)}{string_cell}{string_index}</v></c>')
+            if value.image is not None and row_index > 1:
+                self._image_anchors.append((row_index - 1, column_index, value.image))
+        buffer = self._row_buffer
+        buffer += f'<row r="{row_index}">{"".join(cells)}</row>'.encode("utf-8")
+        if len(buffer) >= self.FLUSH_THRESHOLD:
+            self._stream.write(buffer)
+            buffer.clear()
+
+    def _sheet_header(self) -> str:
         cols_xml = ""
         if self.column_widths:
             col_parts = []
@@ -4153,16 +4762,30 @@ class _SimpleXlsxBuilder:
                     f'<col min="{index}" max="{index}" width="{width}" customWidth="1"/>'
                 )
             cols_xml = f"<cols>{''.join(col_parts)}</cols>"
-        drawing_ref = ""
-        if image_anchors:
-            drawing_ref = '<drawing r:id="rId1"/>'
-        self._image_anchors = image_anchors
         return (
             "<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
             "<worksheet xmlns=\"http://schemas.openxmlformats.org/spreadsheetml/2006/main\" "
             "xmlns:r=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships\">"
-            f"{cols_xml}<sheetData>{sheet_data}</sheetData>{drawing_ref}"
-            "</worksheet>"
+            f"{cols_xml}<sheetData>"
+        )
+
+    def _sheet_footer(self) -> str:
+        drawing_ref = ""
+        if self._image_anchors:
+            drawing_ref = '<drawing r:id="rId1"/>'
+        return f"</sheetData>{drawing_ref}</worksheet>"
+
+    def _shared_strings_xml(self) -> str:
+        items = "".join(
+            f"<si><t xml:space=\"preserve\">{text.translate(_XML_TEXT_ESCAPE_TABLE)}</t></si>"
+            for text in self._shared_strings
+        )
+        return (
+            "<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
+            "<sst xmlns=\"http://schemas.openxmlformats.org/spreadsheetml/2006/main\" "
+            f"count=\"{self._shared_string_refs}\" uniqueCount=\"{len(self._shared_strings)}\">"
+            f"{items}"
+            "</sst>"
         )
 
     def _workbook(self) -> str:
@@ -4171,7 +4794,7 @@ class _SimpleXlsxBuilder:
             "<workbook xmlns=\"http://schemas.openxmlformats.org/spreadsheetml/2006/main\" "
             "xmlns:r=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships\">"
             "<sheets>"
-            f"<sheet name=\"{escape(self.sheet_name)}\" sheetId=\"1\" r:id=\"rId1\"/>"
+            f"<sheet name=\"{self.sheet_name.translate(_XML_ATTR_ESCAPE_TABLE)}\" sheetId=\"1\" r:id=\"rId1\"/>"
             "</sheets>"
             "</workbook>"
         )
@@ -4185,6 +4808,10 @@ class _SimpleXlsxBuilder:
             ("/xl/workbook.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"),
             ("/xl/worksheets/sheet1.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"),
             ("/xl/styles.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"),
+            (
+                "/xl/sharedStrings.xml",
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml",
+            ),
         ]
         if self._image_anchors:
             overrides.append(
@@ -4199,27 +4826,19 @@ class _SimpleXlsxBuilder:
         ]
         for extension, content_type in defaults.items():
             parts.append(
-                f'<Default Extension="{escape(extension)}" ContentType="{escape(content_type)}"/>'
+                f'<Default Extension="{extension.translate(_XML_ATTR_ESCAPE_TABLE)}" ContentType="{content_type.translate(_XML_ATTR_ESCAPE_TABLE)}"/>'
             )
         for part_name, content_type in overrides:
             parts.append(
-                f'<Override PartName="{escape(part_name)}" ContentType="{escape(content_type)}"/>'
+                f'<Override PartName="{part_name.translate(_XML_ATTR_ESCAPE_TABLE)}" ContentType="{content_type.translate(_XML_ATTR_ESCAPE_TABLE)}"/>'
             )
         parts.append("</Types>")
         return "".join(parts)
 
-    def _sheet_rels(self) -> str:
-        return (
-            "<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
-            "<Relationships xmlns=\"http://schemas.openxmlformats.org/package/2006/relationships\">"
-            "<Relationship Id=\"rId1\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing\" Target=\"../drawings/drawing1.xml\"/>"
-            "</Relationships>"
-        )
-
     def _drawing(self) -> str:
         anchors: list[str] = []
         for index, (row, column, image) in enumerate(self._image_anchors, start=1):
-            description = escape(image.description or f"Фото оплаты {index}")
+            description = (image.description or f"Фото оплаты {index}").translate(_XML_ATTR_ESCAPE_TABLE)
             anchors.append(
                 "<xdr:twoCellAnchor>"
                 f"<xdr:from><xdr:col>{column}</xdr:col><xdr:colOff>0</xdr:colOff><xdr:row>{row}</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:from>"
@@ -4263,64 +4882,24 @@ class _SimpleXlsxBuilder:
             "</Relationships>"
         )
 
-    @staticmethod
-    def _rels_root() -> str:
-        return (
-            "<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
-            "<Relationships xmlns=\"http://schemas.openxmlformats.org/package/2006/relationships\">"
-            "<Relationship Id=\"rId1\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument\" Target=\"xl/workbook.xml\"/>"
-            "</Relationships>"
-        )
-
-    @staticmethod
-    def _workbook_rels() -> str:
-        return (
-            "<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
-            "<Relationships xmlns=\"http://schemas.openxmlformats.org/package/2006/relationships\">"
-            "<Relationship Id=\"rId1\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet\" Target=\"worksheets/sheet1.xml\"/>"
-            "<Relationship Id=\"rId2\" Type=\"http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles\" Target=\"styles.xml\"/>"
-            "</Relationships>"
-        )
-
-    @staticmethod
-    def _styles() -> str:
-        return (
-            "<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"yes\"?>"
-            "<styleSheet xmlns=\"http://schemas.openxmlformats.org/spreadsheetml/2006/main\">"
-            "<fonts count=\"2\">"
-            "<font><sz val=\"11\"/><color theme=\"1\"/><name val=\"Calibri\"/><family val=\"2\"/></font>"
-            "<font><b/><sz val=\"11\"/><color theme=\"1\"/><name val=\"Calibri\"/><family val=\"2\"/></font>"
-            "</fonts>"
-            "<fills count=\"1\"><fill><patternFill patternType=\"none\"/></fill></fills>"
-            "<borders count=\"1\"><border><left/><right/><top/><bottom/><diagonal/></border></borders>"
-            "<cellStyleXfs count=\"1\"><xf numFmtId=\"0\" fontId=\"0\" fillId=\"0\" borderId=\"0\"/></cellStyleXfs>"
-            "<cellXfs count=\"3\">"
-            "<xf numFmtId=\"0\" fontId=\"0\" fillId=\"0\" borderId=\"0\" xfId=\"0\"/>"
-            "<xf numFmtId=\"0\" fontId=\"1\" fillId=\"0\" borderId=\"0\" xfId=\"0\" applyFont=\"1\"/>"
-            "<xf numFmtId=\"0\" fontId=\"0\" fillId=\"0\" borderId=\"0\" xfId=\"0\" applyAlignment=\"1\"><alignment wrapText=\"1\"/></xf>"
-            "</cellXfs>"
-            "<cellStyles count=\"1\"><cellStyle name=\"Normal\" xfId=\"0\" builtinId=\"0\"/></cellStyles>"
-            "</styleSheet>"
-        )
-
-    @staticmethod
-    def _column_letter(index: int) -> str:
-        result = ""
-        while index >= 0:
-            index, remainder = divmod(index, 26)
-            result = chr(65 + remainder) + result
-            index -= 1
-        return result
-
     @staticmethod
     def _sanitise_sheet_name(name: str) -> str:
-        sanitized = re.sub(r"[\\/*?:\[\]]", "", name).strip()
+        sanitized = _SHEET_NAME_FORBIDDEN_PATTERN.sub("", name).strip()
         if not sanitized:
             sanitized = "Sheet1"
         return sanitized[:31]
 
     @staticmethod
     def _normalise_cell(value: Any) -> _XlsxCell:
+        # Exact type checks first: export rows are almost always cells or strings.
+        value_type = type(value)
+        if value_type is _XlsxCell:
+            return value
+        if value_type is str:
+            return _XlsxCell(value)
+        if value_type is int or value_type is float:
+            # Numbers stay text cells so phone numbers and long ids keep every digit.
+            return _XlsxCell(repr(value))
         if isinstance(value, _XlsxCell):
             return value
         if isinstance(value, _XlsxImage):
@@ -4497,18 +5076,20 @@ class _GoogleSheetsExporter:
         ]
 
         try:
-            service.spreadsheets().values().clear(
-                spreadsheetId=self.spreadsheet_id,
-                range=clear_range,
-            ).execute()
+            column_count = max(len(row) for row in normalised_rows)
+            # Formatting is best effort: if the combined batch is rejected, fall back
+            # to a plain clear so the values are still written.
+            if self._sheet_id is None or not self._clear_and_format(service, column_count, column_widths):
+                service.spreadsheets().values().clear(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=clear_range,
+                ).execute()
             service.spreadsheets().values().update(
                 spreadsheetId=self.spreadsheet_id,
                 range=update_range,
                 valueInputOption="USER_ENTERED",
                 body={"values": values},
             ).execute()
-            column_count = max(len(row) for row in normalised_rows)
-            self._apply_formatting(service, column_count, column_widths)
         except GoogleHttpError as exc:  # pragma: no cover - network dependent
             LOGGER.warning("Ошибка обновления Google Sheets: %s", exc)
             return None
@@ -4565,16 +5146,24 @@ class _GoogleSheetsExporter:
         if self._sheet_title is None:
             self._sheet_title = preferred
 
-    def _apply_formatting(
+    def _clear_and_format(
         self,
         service: Any,
         column_count: int,
         column_widths: Sequence[float],
-    ) -> None:
-        if self._sheet_id is None or column_count <= 0:
-            return
+    ) -> bool:
+        """Clear old values and apply the table layout in a single ``batchUpdate``.
+
+        Returns ``False`` when the batch fails, leaving the sheet untouched.
+        """
 
         requests: list[dict[str, Any]] = [
+            {
+                "updateCells": {
+                    "range": {"sheetId": self._sheet_id},
+                    "fields": "userEnteredValue",
+                }
+            },
             {
                 "updateSheetProperties": {
                     "properties": {
@@ -4645,6 +5234,8 @@ class _GoogleSheetsExporter:
             ).execute()
         except GoogleHttpError:  # pragma: no cover - network dependent
             LOGGER.debug("Не удалось применить форматирование для Google Sheets.")
+            return False
+        return True
 
     @staticmethod
     def _column_width_to_pixels(width: float) -> int:
@@ -4680,44 +5271,71 @@ class _GoogleSheetsExporter:
 def _normalise_admin_chat_ids(chat_ids: AdminChatIdsInput) -> frozenset[int]:
     """Return a normalised, deduplicated set of admin chat identifiers."""
 
-    result: set[int] = set()
-    for candidate in _iter_chat_id_candidates(chat_ids):
-        for part in _split_candidate(candidate):
-            result.add(_coerce_chat_id(part))
-    return frozenset(result)
+    return frozenset(
+        _coerce_chat_id(part)
+        for candidate in _iter_chat_id_candidates(chat_ids)
+        for part in (
+            (piece for piece in candidate.split(",") if piece and not piece.isspace())
+            if isinstance(candidate, str)
+            else (candidate,)
+        )
+    )
 
 
 def _iter_chat_id_candidates(value: AdminChatIdsInput) -> Iterable[ChatIdInput]:
     if value is None:
         return ()
-    if isinstance(value, (str, bytes)):
+    if isinstance(value, (str, bytes)) or not isinstance(value, Iterable):
         return (value,)
-    if isinstance(value, Iterable):
-        return tuple(value)
-    return (value,)
-
-
-def _split_candidate(candidate: ChatIdInput) -> Iterable[ChatIdInput]:
-    if isinstance(candidate, str):
-        parts = [part.strip() for part in candidate.split(",")]
-        return tuple(part for part in parts if part)
-    return (candidate,)
+    return value
 
 
 def _coerce_chat_id(value: ChatIdInput) -> int:
+    # Plain ints are by far the most common input; ``bool`` is excluded by the exact type check.
+    if type(value) is int:
+        return value
     if isinstance(value, bool):
         raise ValueError("Boolean values cannot represent a chat id")
-    if isinstance(value, str):
-        stripped = value.strip()
-        if not stripped:
-            raise ValueError("Chat id strings cannot be empty")
-        value = stripped
     try:
+        # ``int()`` ignores surrounding whitespace itself.
         return int(value)
     except (TypeError, ValueError) as exc:  # pragma: no cover - guard clause
+        if isinstance(value, str) and not value.strip():
+            raise ValueError("Chat id strings cannot be empty") from exc
         raise ValueError(f"Invalid chat id: {value!r}") from exc
 
 
+_CREATED_DIRECTORIES: set[Path] = set()
+
+
+def _ensure_directory(path: Path) -> None:
+    """Create ``path`` (and parents) once per process; later calls skip the syscall."""
+
+    if path in _CREATED_DIRECTORIES:
+        return
+    path.mkdir(parents=True, exist_ok=True)
+    _CREATED_DIRECTORIES.add(path)
+
+
+@lru_cache(maxsize=None)
+def _exact_match_pattern(text: str) -> re.Pattern[str]:
+    """Compile the handler pattern for a button label once; labels repeat across states."""
+
+    return re.compile(rf"^{re.escape(text)}$")
+
+
+@lru_cache(maxsize=4096)
+def _parse_timestamp_text(value: str) -> Optional[datetime]:
+    """Parse a stored ``created_at`` string; memoised as records repeat them."""
+
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
 def _coerce_chat_id_from_object(chat: Any) -> int:
     if hasattr(chat, "id"):
         chat = getattr(chat, "id")
@@ -4787,6 +5405,8 @@ def main() -> None:  # pragma: no cover - thin wrapper
             "Убедитесь, что есть доступ к сети и что запросы к Telegram не блокируются."
         )
         raise SystemExit(1) from exc
+    finally:
+        bot.flush_persistent_state()
 
 
 TOKEN_ENVIRONMENT_KEYS: tuple[str, ...] = (
@@ -4809,20 +5429,30 @@ TOKEN_FILE_ENVIRONMENT_KEYS: tuple[str, ...] = (
 def _resolve_bot_token() -> Optional[str]:
     """Read the bot token from the environment and validate it."""
 
-    for key in TOKEN_ENVIRONMENT_KEYS:
-        token = os.environ.get(key)
-        if token:
-            token = token.strip()
-            if token and token != "TOKEN_PLACEHOLDER":
-                return token
-
-    for key in TOKEN_FILE_ENVIRONMENT_KEYS:
-        token_path = os.environ.get(key)
-        if token_path:
-            token = _read_token_file(Path(token_path))
-            if token:
-                return token
-    return None
+    environ = os.environ
+    token = next(
+        (
+            token
+            for key in TOKEN_ENVIRONMENT_KEYS
+            if (token := environ.get(key, "").strip()) and token != "TOKEN_PLACEHOLDER"
+        ),
+        None,
+    )
+    if token is not None:
+        return token
+
+    return next(
+        (
+            token
+            for key in TOKEN_FILE_ENVIRONMENT_KEYS
+            if (token_path := environ.get(key)) and (token := _read_token_file(Path(token_path)))
+        ),
+        None,
+    )
+
+
+# ``[export ]KEY = value`` with surrounding whitespace trimmed; comment lines never match.
+_ENV_ASSIGNMENT_PATTERN = re.compile(r"(?!\s*#)\s*(?:export )?\s*([^=]*?)\s*=\s*(.*?)\s*")
 
 
 def _load_environment_files() -> None:
@@ -4834,11 +5464,10 @@ def _load_environment_files() -> None:
 
 
 def _apply_env_file(path: Path) -> None:
-    if not path.exists() or not path.is_file():
-        return
-
     try:
         content = path.read_text(encoding="utf-8")
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return
     except OSError as exc:  # pragma: no cover - filesystem dependent
         LOGGER.warning("Failed to read environment file %s: %s", path, exc)
         return
@@ -4862,10 +5491,17 @@ def _apply_env_file(path: Path) -> None:
                 pending_value_lines = []
             continue
 
-        parsed = _parse_env_assignment(line)
-        if not parsed:
+        match = _ENV_ASSIGNMENT_PATTERN.fullmatch(line)
+        if match is None:
+            if line.strip() and not line.lstrip().startswith("#"):
+                LOGGER.debug("Ignoring malformed environment line: %s", line)
+            continue
+        key, value = match.groups()
+        if not key:
+            LOGGER.debug("Ignoring environment line with empty key: %s", line)
             continue
-        key, value = parsed
+        if value and value[0] == value[-1] and value[0] in {'"', "'"}:
+            value = value[1:-1]
         if key in os.environ:
             continue
         if _value_is_multiline_stub(value):
@@ -4883,34 +5519,6 @@ def _apply_env_file(path: Path) -> None:
         )
 
 
-def _parse_env_assignment(line: str) -> Optional[tuple[str, str]]:
-    """Parse a dotenv-style assignment returning ``(key, value)`` when valid."""
-
-    stripped = line.strip()
-    if not stripped or stripped.startswith("#"):
-        return None
-
-    if stripped.startswith("export "):
-        stripped = stripped[len("export ") :].lstrip()
-
-    if "=" not in stripped:
-        LOGGER.debug("Ignoring malformed environment line: %s", line)
-        return None
-
-    key, value = stripped.split("=", 1)
-    key = key.strip()
-    value = value.strip()
-
-    if not key:
-        LOGGER.debug("Ignoring environment line with empty key: %s", line)
-        return None
-
-    if value and value[0] == value[-1] and value[0] in {'"', "'"}:
-        value = value[1:-1]
-
-    return key, value
-
-
 def _value_is_multiline_stub(value: str) -> bool:
     if not value:
         return False
@@ -0,0 +1,95 @@
+from pathlib import Path
+from types import SimpleNamespace
+import asyncio
+import importlib.util
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+
+def load_main_module():
+    module_path = Path(__file__).resolve().parent.parent / "main.py"
+    spec = importlib.util.spec_from_file_location("main", module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+main = load_main_module()
+
+
+def make_bot(storage_path):
+    return main.ConfettiTelegramBot(token="token", admin_chat_ids={1}, storage_path=storage_path)
+
+
+def test_stale_payload_does_not_overwrite_newer_state(tmp_path):
+    path = tmp_path / "state.json"
+    bot = make_bot(path)
+
+    bot._persistent_store["registrations"].append({"id": "old"})
+    stale = bot._encode_persistent_state()
+    bot._persistent_store["registrations"].append({"id": "new"})
+    bot._save_persistent_state()
+
+    assert bot._write_persistent_payload(*stale) is False
+    stored = json.loads(path.read_text(encoding="utf-8"))
+    assert [item["id"] for item in stored["registrations"]] == ["old", "new"]
+
+
+def test_shutdown_waits_for_a_write_already_in_progress(tmp_path):
+    path = tmp_path / "state.json"
+    bot = make_bot(path)
+    started = threading.Event()
+    calls = []
+    write = bot._write_persistent_payload
+
+    def slow_write(generation, payload):
+        calls.append(("start", generation))
+        started.set()
+        time.sleep(0.2)
+        written = write(generation, payload)
+        calls.append(("end", generation))
+        return written
+
+    bot._write_persistent_payload = slow_write
+
+    async def scenario():
+        bot._persistent_store["registrations"].append({"id": "first"})
+        bot._storage_dirty = True
+        bot._flush_task = asyncio.create_task(bot._write_dirty_state())
+        await asyncio.to_thread(started.wait)
+        bot._persistent_store["registrations"].append({"id": "second"})
+        bot._storage_dirty = True
+        await bot._stop_state_flusher(None)
+
+    asyncio.run(scenario())
+
+    assert calls == [("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+    stored = json.loads(path.read_text(encoding="utf-8"))
+    assert [item["id"] for item in stored["registrations"]] == ["first", "second"]
+
+
+@pytest.mark.parametrize("save_with_orjson", [True, False])
+@pytest.mark.parametrize("load_with_orjson", [True, False])
+def test_user_profiles_round_trip_with_int_keys(tmp_path, monkeypatch, save_with_orjson, load_with_orjson):
+    # orjson is a declared dependency, so its branch must run rather than be skipped.
+    assert main.orjson is not None
+    orjson = main.orjson
+    path = tmp_path / "state.json"
+
+    monkeypatch.setattr(main, "orjson", orjson if save_with_orjson else None)
+    bot = make_bot(path)
+    user = SimpleNamespace(id=42)
+    bot._update_user_defaults(user, {"child_name": "Аня", "class": "1А", "phone": "+79990000000"})
+    bot._save_persistent_state()
+
+    monkeypatch.setattr(main, "orjson", orjson if load_with_orjson else None)
+    reloaded = make_bot(path)
+
+    assert list(reloaded._user_profiles) == [42]
+    assert reloaded._get_user_defaults(user)["child_name"] == "Аня"
@@ -0,0 +1,66 @@
+from pathlib import Path
+import asyncio
+import importlib.util
+import sys
+
+
+def load_main_module():
+    module_path = Path(__file__).resolve().parent.parent / "main.py"
+    spec = importlib.util.spec_from_file_location("main", module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+main = load_main_module()
+
+
+class SemaphoreProcessor:
+    """Mirror of python-telegram-bot 20.x ``BaseUpdateProcessor.process_update``."""
+
+    def __init__(self, max_concurrent_updates):
+        self._semaphore = asyncio.BoundedSemaphore(max_concurrent_updates)
+
+    async def process_update(self, update, coroutine):
+        async with self._semaphore:
+            await self.do_process_update(update, coroutine)
+
+
+class Processor(main._PerChatOrdering, SemaphoreProcessor):
+    pass
+
+
+class FakeUpdate:
+    def __init__(self, chat_id):
+        self.effective_chat = type("Chat", (), {"id": chat_id})()
+
+
+def test_backlog_in_one_chat_does_not_block_other_chats():
+    async def scenario():
+        processor = Processor(2)
+        release_busy = asyncio.Event()
+        order: list[str] = []
+
+        async def busy(index):
+            order.append(f"busy-{index}")
+            await release_busy.wait()
+
+        async def other():
+            order.append("other")
+
+        busy_tasks = [
+            asyncio.create_task(processor.process_update(FakeUpdate(1), busy(index))) for index in range(5)
+        ]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(processor.process_update(FakeUpdate(2), other()), timeout=1)
+        assert order == ["busy-0", "other"]
+
+        release_busy.set()
+        await asyncio.gather(*busy_tasks)
+        assert order[2:] == [f"busy-{index}" for index in range(1, 5)]
+        assert processor._chat_locks == {}
+        assert processor._pending == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,125 @@
+from pathlib import Path
+from types import SimpleNamespace
+import importlib.util
+import sys
+
+
+def load_main_module():
+    module_path = Path(__file__).resolve().parent.parent / "main.py"
+    spec = importlib.util.spec_from_file_location("main", module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+main = load_main_module()
+
+
+def make_bot(storage_path):
+    return main.ConfettiTelegramBot(token="token", admin_chat_ids={1}, storage_path=storage_path)
+
+
+def make_record(record_id, **fields):
+    return {"id": record_id, "submitted_by_id": 42, "chat_id": 42, **fields}
+
+
+def test_prefill_prefers_latest_snapshot_over_profile_defaults(tmp_path):
+    bot = make_bot(tmp_path / "state.json")
+    user = SimpleNamespace(id=42)
+    bot._update_user_defaults(user, {"child_name": "Аня", "class": "1А", "phone": "+79990000000"})
+    bot._append_user_registration_snapshot(make_record("r1", child_name="Аня", **{"class": "2Б"}), user)
+    bot._append_user_registration_snapshot(make_record("r2", child_name="Маша", **{"class": "3В"}), user)
+
+    registration: dict = {}
+    prefilled = bot._prefill_registration_details(
+        registration, bot._get_user_defaults(user), bot._collect_user_registrations(user, user)
+    )
+
+    assert prefilled is True
+    assert registration == {"child_name": "Маша", "class": "3В", "phone": "+79990000000"}
+
+
+def test_prefill_falls_back_to_profile_defaults(tmp_path):
+    bot = make_bot(tmp_path / "state.json")
+    user = SimpleNamespace(id=42)
+    bot._update_user_defaults(user, {"child_name": "Аня", "class": "1А", "phone": "+79990000000"})
+
+    registration: dict = {}
+    prefilled = bot._prefill_registration_details(
+        registration, bot._get_user_defaults(user), bot._collect_user_registrations(user, user)
+    )
+
+    assert prefilled is True
+    assert registration == {"child_name": "Аня", "class": "1А", "phone": "+79990000000"}
+
+
+def test_prefill_reports_nothing_for_a_new_user(tmp_path):
+    bot = make_bot(tmp_path / "state.json")
+    user = SimpleNamespace(id=42)
+
+    registration: dict = {}
+    prefilled = bot._prefill_registration_details(
+        registration, bot._get_user_defaults(user), bot._collect_user_registrations(user, user)
+    )
+
+    assert prefilled is False
+    assert registration == {}
+
+
+def test_collect_reflects_append_then_remove(tmp_path):
+    bot = make_bot(tmp_path / "state.json")
+    user = SimpleNamespace(id=42)
+    record = make_record("r1", program="Французский")
+
+    bot._append_user_registration_snapshot(record, user)
+    assert [item["id"] for item in bot._collect_user_registrations(user, user)] == ["r1"]
+
+    bot._remove_user_registration_snapshot(record)
+
+    assert not any(42 in identity_keys for identity_keys in bot._collect_cache)
+    assert bot._collect_user_registrations(user, user) == []
+
+
+def test_collect_cache_is_bounded(tmp_path, monkeypatch):
+    bot = make_bot(tmp_path / "state.json")
+    monkeypatch.setattr(bot, "COLLECT_CACHE_SIZE", 2)
+
+    for user_id in (10, 11, 12):
+        bot._collect_user_registrations(SimpleNamespace(id=user_id), None)
+
+    assert list(bot._collect_cache) == [(11,), (12,)]
+
+
+def test_snapshot_index_follows_in_place_replacement(tmp_path):
+    bot = make_bot(tmp_path / "state.json")
+    user = SimpleNamespace(id=42)
+    bot._append_user_registration_snapshot(make_record("r1", program="Французский"), user)
+    bot._append_user_registration_snapshot(make_record("r2", program="Английский"), user)
+
+    registrations = bot._user_profiles[42]["registrations"]
+    registrations[0] = {"id": "r3", "program": "Немецкий"}
+    bot._touch_profile(42)
+
+    bot._append_user_registration_snapshot(make_record("r3", program="Испанский"), user)
+    bot._append_user_registration_snapshot(make_record("r1", program="Французский"), user)
+
+    assert [(item["id"], item["program"]) for item in registrations] == [
+        ("r3", "Испанский"),
+        ("r2", "Английский"),
+        ("r1", "Французский"),
+    ]
+
+
+def test_removed_snapshot_forgets_its_timestamp(tmp_path):
+    bot = make_bot(tmp_path / "state.json")
+    user = SimpleNamespace(id=42)
+    record = make_record("r1", program="Французский", created_at="2024-05-01 10:00")
+
+    bot._append_user_registration_snapshot(record, user)
+    assert "r1" in bot._registration_timestamps
+
+    bot._remove_user_registration_snapshot(record)
+
+    assert "r1" not in bot._registration_timestamps
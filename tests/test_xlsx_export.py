@@ -0,0 +1,135 @@
+from pathlib import Path
+from types import SimpleNamespace
+from xml.sax.saxutils import escape
+from zipfile import ZipFile
+import asyncio
+import importlib.util
+import sys
+import time
+
+import pytest
+
+
+def load_main_module():
+    module_path = Path(__file__).resolve().parent.parent / "main.py"
+    spec = importlib.util.spec_from_file_location("main", module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+main = load_main_module()
+
+
+def test_builder_streams_rows_with_shared_strings(tmp_path):
+    builder = main._SimpleXlsxBuilder("Заявки", column_widths=(10, 20))
+    path = tmp_path / "export.xlsx"
+
+    with builder.open(path):
+        builder.add_row(["Программа", "Комментарий"])
+        builder.add_row(["Французский", "a < b & c"])
+        builder.add_row(["Французский", main._XlsxCell.hyperlink("Фото", "https://t.me/bot?start=x")])
+
+    with ZipFile(path) as archive:
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        shared = archive.read("xl/sharedStrings.xml").decode("utf-8")
+        assert "xl/sharedStrings.xml" in archive.read("[Content_Types].xml").decode("utf-8")
+
+    assert shared.count("<si>") == 4
+    assert "a &lt; b &amp; c" in shared
+    assert sheet.count('<v>2</v>') == 2
+    assert '<f>HYPERLINK("https://t.me/bot?start=x","Фото")</f>' in sheet
+
+
+def test_write_rows_consumes_an_iterator(tmp_path):
+    builder = main._SimpleXlsxBuilder("Sheet")
+    path = tmp_path / "streamed.xlsx"
+
+    builder.write_rows(path, (["row", index] for index in range(3)))
+
+    with ZipFile(path) as archive:
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert '<row r="3">' in sheet
+    assert '<row r="4">' not in sheet
+
+
+def test_translate_tables_match_saxutils_escape():
+    sample = 'a & b < c > d "e" \'f\'\nЖ'
+
+    assert sample.translate(main._XML_ESCAPE_TABLE) == escape(sample)
+    assert sample.translate(main._XML_TEXT_ESCAPE_TABLE) == escape(sample, {"\n": "&#10;"})
+    assert sample.translate(main._XML_ATTR_ESCAPE_TABLE) == escape(sample, {'"': "&quot;"})
+
+
+def test_add_row_requires_an_open_workbook():
+    builder = main._SimpleXlsxBuilder("Sheet")
+
+    with pytest.raises(RuntimeError):
+        builder.add_row(["one"])
+
+
+def test_failed_write_keeps_the_previous_workbook(tmp_path):
+    builder = main._SimpleXlsxBuilder("Sheet")
+    path = tmp_path / "export.xlsx"
+    builder.write_rows(path, [["old"]])
+    previous = path.read_bytes()
+
+    def rows():
+        yield ["new"]
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        builder.write_rows(path, rows())
+
+    assert path.read_bytes() == previous
+    assert sorted(item.name for item in tmp_path.iterdir()) == ["export.xlsx"]
+
+
+def test_numbers_are_written_as_text_cells(tmp_path):
+    builder = main._SimpleXlsxBuilder("Sheet")
+    path = tmp_path / "numbers.xlsx"
+
+    builder.write_rows(path, [[79991234567, 2**53 + 1, 2.5, True]])
+
+    with ZipFile(path) as archive:
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        shared = archive.read("xl/sharedStrings.xml").decode("utf-8")
+    assert sheet.count('t="s"') == 4
+    for text in ("79991234567", str(2**53 + 1), "2.5", "True"):
+        assert f">{text}</t></si>" in shared
+
+
+def test_concurrent_exports_take_turns(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bot = main.ConfettiTelegramBot(token="token", admin_chat_ids={1}, storage_path=tmp_path / "state.json")
+    write = bot._write_registrations_workbook
+    active: list[int] = []
+    overlaps: list[int] = []
+
+    def slow_write(path, rows):
+        active.append(1)
+        overlaps.append(len(active))
+        time.sleep(0.05)
+        write(path, rows)
+        active.pop()
+
+    monkeypatch.setattr(bot, "_write_registrations_workbook", slow_write)
+
+    async def export_twice():
+        first = [[main._XlsxCell("first")]]
+        second = [[main._XlsxCell("second")]]
+        return await asyncio.gather(
+            bot._export_registrations_excel(SimpleNamespace(), first),
+            bot._export_registrations_excel(SimpleNamespace(), second),
+        )
+
+    (path, _), _ = asyncio.run(export_twice())
+
+    assert overlaps == [1, 1]
+    with ZipFile(path) as archive:
+        assert "second" in archive.read("xl/sharedStrings.xml").decode("utf-8")
+    assert bot._persistent_store["exports"]["registrations"]["digest"] == bot._table_rows_digest(
+        [[main._XlsxCell("second")]]
+    )